@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+"""Benchmarks validate and the HTML summary over synthetic tables
+
+Each case runs in a fresh process, so its peak memory is not affected by
+the previous ones, against a fake Qiita client, so no server is needed.
+The results can be saved as a baseline and later runs compared to it::
+
+    python benchmarks/run_benchmarks.py --preset small \\
+        --save-baseline benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --preset small \\
+        --baseline benchmarks/baseline.json
+"""
+
+from json import dump, dumps, load
+from multiprocessing import get_context
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from time import perf_counter, process_time
+
+import click
+
+import synthetic
+
+
+# (number of features, number of samples) of the tables of each preset
+PRESETS = {
+    'small': [(1000, 100), (10000, 1000)],
+    'medium': [(1000, 100), (10000, 1000), (100000, 10000)],
+    'large': [(1000, 100), (10000, 1000), (100000, 10000),
+              (1000000, 100000)]}
+
+CASES = ['validate', 'summary-native', 'summary-qiime2']
+
+
+class FakeClient(object):
+    """Qiita client serving the metadata of a synthetic analysis"""
+    def __init__(self, metadata):
+        self.metadata = metadata
+
+    def get(self, url):
+        return self.metadata
+
+    def update_job_step(self, job_id, step):
+        pass
+
+
+def _generate(work_dir, n_features, n_samples, nnz_per_sample):
+    """Writes the synthetic files of a table size into work_dir"""
+    f_ids = synthetic.feature_ids(n_features)
+    s_ids = synthetic.sample_ids(n_samples)
+    files = {'biom': join(work_dir, 'table.biom'),
+             'preprocessed_fasta': join(work_dir, 'repset.fna'),
+             'plain_text': join(work_dir, 'insertion_tree.tre')}
+    synthetic.write_table(files['biom'], f_ids, s_ids, nnz_per_sample)
+    synthetic.write_fasta(files['preprocessed_fasta'], f_ids)
+    synthetic.write_tree(files['plain_text'], f_ids)
+    return files, synthetic.metadata(s_ids)
+
+
+def _has_qiime2():
+    """Whether QIIME 2 and the feature-table plugin can be imported"""
+    try:
+        import qiime2.plugins.feature_table  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _run_case(case, files, metadata, out_dir):
+    """Runs a benchmark case, returning None if it can't run here"""
+    has_qiime2 = _has_qiime2()
+    if case == 'validate':
+        if not has_qiime2:
+            # without QIIME 2, validate generates the native summary and is
+            # given a qza, as an artifact that already has one, so it doesn't
+            # save it. The case runs in its own process, so only this case
+            # sees the changed configuration
+            from qtp_biom.util import get_config
+            get_config().set('summary', 'SUMMARY_BACKEND', 'native')
+            files = dict(files, qza=join(out_dir, 'existing.qza'))
+            open(files['qza'], 'w').close()
+        from qtp_biom.validate import validate
+
+        parameters = {'analysis': 1, 'artifact_type': 'BIOM',
+                      'files': dumps({k: [v] for k, v in files.items()})}
+        success, _, error = validate(
+            FakeClient(metadata), 'benchmark', parameters, out_dir)
+        if not success:
+            raise RuntimeError(error)
+    else:
+        from qtp_biom.summary import _generate_html_summary
+
+        backend = case.split('-', 1)[1]
+        if backend == 'qiime2' and not has_qiime2:
+            return None
+        # the qza is saved with QIIME 2
+        _generate_html_summary(files['biom'], metadata, out_dir, True,
+                               backend=backend, save_qza=has_qiime2)
+    return True
+
+
+def _measure(queue, case, files, metadata, out_dir):
+    """Runs a case in the current process and puts its measurements in queue
+    """
+    from qtp_biom.instrument import peak_rss
+
+    try:
+        wall, cpu = perf_counter(), process_time()
+        ran = _run_case(case, files, metadata, out_dir)
+        wall, cpu = perf_counter() - wall, process_time() - cpu
+    except Exception as e:
+        queue.put({'error': '%s: %s' % (type(e).__name__, e)})
+        return
+    if ran is None:
+        queue.put({'skipped': True})
+    else:
+        queue.put({'wall_time': round(wall, 4), 'cpu_time': round(cpu, 4),
+                   'peak_rss_mb': round(peak_rss(), 1)})
+
+
+def run_case(case, files, metadata):
+    """Runs a case in a fresh process
+
+    Returns
+    -------
+    dict
+        The wall and CPU times, in seconds, and the peak RSS, in MB, or the
+        reason why the case didn't run
+    """
+    out_dir = mkdtemp()
+    mp = get_context('spawn')
+    queue = mp.Queue()
+    proc = mp.Process(target=_measure,
+                      args=(queue, case, files, metadata, out_dir))
+    proc.start()
+    try:
+        result = queue.get()
+    finally:
+        proc.join()
+        rmtree(out_dir, ignore_errors=True)
+    return result
+
+
+def compare(results, baseline, tolerance):
+    """Compares the results to a baseline
+
+    Parameters
+    ----------
+    results : dict of {str: dict}
+        The measurements, keyed by case name
+    baseline : dict of {str: dict}
+        The baseline measurements, keyed by case name
+    tolerance : float
+        The relative increase over the baseline considered a regression
+
+    Returns
+    -------
+    list of str
+        The regressions
+    """
+    regressions = []
+    for name, obs in sorted(results.items()):
+        exp = baseline.get(name)
+        if exp is None or 'wall_time' not in obs or 'wall_time' not in exp:
+            continue
+        for metric in ('wall_time', 'peak_rss_mb'):
+            if obs[metric] > exp[metric] * (1 + tolerance):
+                regressions.append('%s: %s %s -> %s' % (
+                    name, metric, exp[metric], obs[metric]))
+    return regressions
+
+
+@click.command()
+@click.option('--preset', type=click.Choice(sorted(PRESETS)),
+              default='small', show_default=True,
+              help='The table sizes to benchmark')
+@click.option('--case', 'cases', type=click.Choice(CASES), multiple=True,
+              help='The cases to run, all by default')
+@click.option('--nnz-per-sample', type=int, default=500, show_default=True,
+              help='The number of features observed in each sample')
+@click.option('--output', type=click.Path(dir_okay=False),
+              help='Write the results as JSON to this file')
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False),
+              help='Compare the results to this baseline')
+@click.option('--save-baseline', type=click.Path(dir_okay=False),
+              help='Save the results as the baseline in this file')
+@click.option('--tolerance', type=float, default=0.25, show_default=True,
+              help='Relative increase over the baseline reported as a '
+                   'regression')
+def benchmark(preset, cases, nnz_per_sample, output, baseline, save_baseline,
+              tolerance):
+    """Benchmarks validate and the HTML summary over synthetic tables"""
+    cases = cases or CASES
+    results = {}
+    for n_features, n_samples in PRESETS[preset]:
+        work_dir = mkdtemp()
+        try:
+            files, metadata = _generate(work_dir, n_features, n_samples,
+                                        nnz_per_sample)
+            for case in cases:
+                name = '%s-%dx%d' % (case, n_features, n_samples)
+                results[name] = run_case(case, files, metadata)
+                click.echo('%s: %s' % (name, results[name]))
+        finally:
+            rmtree(work_dir, ignore_errors=True)
+
+    for fp in (output, save_baseline):
+        if fp is not None:
+            with open(fp, 'w') as f:
+                dump(results, f, indent=2, sort_keys=True)
+
+    if baseline is not None:
+        with open(baseline) as f:
+            regressions = compare(results, load(f), tolerance)
+        for regression in regressions:
+            click.echo('REGRESSION %s' % regression, err=True)
+        if regressions:
+            raise click.exceptions.Exit(1)
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,152 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+"""Generators of synthetic BIOM tables, representative sets and trees"""
+
+import numpy as np
+
+
+SEQ_LENGTH = 100
+NUCLEOTIDES = np.array(list('ACGT'))
+
+
+def feature_ids(n_features, length=SEQ_LENGTH):
+    """Generates unique sequences to be used as feature ids, like Deblur does
+
+    Parameters
+    ----------
+    n_features : int
+        The number of features
+    length : int, optional
+        The length of the sequences
+
+    Returns
+    -------
+    np.array of str
+        The feature ids
+    """
+    # the index of each feature, written in base 4, makes the sequences
+    # unique, and the rest of the sequence is a fixed tail
+    n_digits = max(int(np.ceil(np.log(max(n_features, 2)) / np.log(4))), 1)
+    digits = (np.arange(n_features)[:, None] //
+              4 ** np.arange(n_digits)[None, :]) % 4
+    tail = ''.join(NUCLEOTIDES[np.arange(max(length - n_digits, 0)) % 4])
+    return np.array([''.join(row) + tail for row in NUCLEOTIDES[digits]])
+
+
+def sample_ids(n_samples, prefix='1'):
+    """Generates Qiita-like sample ids
+
+    Parameters
+    ----------
+    n_samples : int
+        The number of samples
+    prefix : str, optional
+        The study prefix of the sample ids
+
+    Returns
+    -------
+    np.array of str
+        The sample ids
+    """
+    return np.array(['%s.sample.%d' % (prefix, i) for i in range(n_samples)])
+
+
+def write_table(fp, f_ids, s_ids, nnz_per_sample=500, seed=0):
+    """Writes a random sparse BIOM table in HDF5 format
+
+    Parameters
+    ----------
+    fp : str
+        The output filepath
+    f_ids : np.array of str
+        The feature ids
+    s_ids : np.array of str
+        The sample ids
+    nnz_per_sample : int, optional
+        The number of features observed in each sample
+    seed : int, optional
+        The seed of the random generator
+    """
+    from biom import Table
+    from biom.util import biom_open
+    from scipy.sparse import csc_matrix
+
+    rng = np.random.default_rng(seed)
+    n_features, n_samples = len(f_ids), len(s_ids)
+    per_sample = min(nnz_per_sample, n_features)
+    indices = np.concatenate([
+        np.sort(rng.choice(n_features, per_sample, replace=False))
+        for _ in range(n_samples)])
+    indptr = np.arange(n_samples + 1) * per_sample
+    data = rng.integers(1, 1000, len(indices)).astype(float)
+    matrix = csc_matrix((data, indices, indptr),
+                        shape=(n_features, n_samples))
+    table = Table(matrix, f_ids, s_ids)
+    with biom_open(fp, 'w') as f:
+        table.to_hdf5(f, 'qtp-biom benchmarks')
+
+
+def write_fasta(fp, f_ids):
+    """Writes the representative set of the features
+
+    Parameters
+    ----------
+    fp : str
+        The output filepath
+    f_ids : np.array of str
+        The feature ids, which are also their sequences
+    """
+    with open(fp, 'w') as f:
+        for fid in f_ids:
+            f.write('>%s\n%s\n' % (fid, fid))
+
+
+def write_tree(fp, f_ids, n_reference=None):
+    """Writes a balanced Newick tree with the features placed in it
+
+    Parameters
+    ----------
+    fp : str
+        The output filepath
+    f_ids : np.array of str
+        The feature ids, placed as tips of the tree
+    n_reference : int, optional
+        The number of reference tips, defaults to the number of features
+    """
+    if n_reference is None:
+        n_reference = len(f_ids)
+    nodes = ['R%d:0.1' % i for i in range(n_reference)]
+    nodes.extend('%s:0.1' % fid for fid in f_ids)
+    # join pairs of nodes until a single root remains
+    while len(nodes) > 1:
+        pairs = ['(%s,%s):0.1' % (a, b)
+                 for a, b in zip(nodes[::2], nodes[1::2])]
+        if len(nodes) % 2:
+            pairs.append(nodes[-1])
+        nodes = pairs
+    with open(fp, 'w') as f:
+        f.write('(%s);\n' % nodes[0])
+
+
+def metadata(s_ids):
+    """Generates the metadata of the samples, keyed by sample id
+
+    Parameters
+    ----------
+    s_ids : np.array of str
+        The sample ids
+
+    Returns
+    -------
+    dict of {str: dict}
+        The metadata, with a categorical and a numeric column
+    """
+    return {sid: {'body_site': ('gut', 'skin', 'oral')[i % 3],
+                  'ph': str(6 + (i % 20) / 10)}
+            for i, sid in enumerate(s_ids.tolist())}
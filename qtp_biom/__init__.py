@@ -8,8 +8,11 @@
 
 from qiita_client import QiitaTypePlugin, QiitaArtifactType
 
+# validate and summary import qiime2, biom, pandas and bp only when a job
+# runs, so importing the plugin (e.g. to configure it) stays fast
 from .validate import validate
 from .summary import generate_html_summary
+from .util import PLUGIN_VERSION
 
 # Define the supported artifact types
 artifact_types = [
@@ -19,7 +22,7 @@ artifact_types = [
                        ('qza', False)])]
 
 # Initialize the plugin
-plugin = QiitaTypePlugin('BIOM type', '2.1.4 - Qiime2',
+plugin = QiitaTypePlugin('BIOM type', PLUGIN_VERSION,
                          'The Biological Observation Matrix format',
                          validate, generate_html_summary,
                          artifact_types)
@@ -0,0 +1,175 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from concurrent.futures import ThreadPoolExecutor
+from os import makedirs
+from os.path import join
+
+from .util import plugin_credentials
+from .validate import validate, _collect_metadata
+
+
+def _metadata_key(parameters):
+    """The (template, analysis) pair identifying the metadata of a job"""
+    prep_id = parameters.get('template')
+    analysis_id = parameters.get('analysis') if prep_id is None else None
+    return prep_id, analysis_id
+
+
+def _fetch_metadata(qclient, key):
+    """Retrieves the metadata of key, returning it with an error message"""
+    try:
+        return _collect_metadata(qclient, *key), None
+    except Exception as e:
+        return None, str(e)
+
+
+def _validate(qclient, job_id, parameters, out_dir, metadata):
+    """Runs validate, reporting any exception as a failed job"""
+    try:
+        return validate(qclient, job_id, parameters, out_dir, metadata)
+    except Exception as e:
+        return False, None, str(e)
+
+
+def validate_batch(qclient, jobs, out_dir, workers=None):
+    """Validates several BIOM artifacts sharing the metadata requests
+
+    The metadata of all the preparations and analyses is retrieved
+    concurrently, once per preparation or analysis, and the artifacts are
+    validated in a pool of workers.
+
+    Parameters
+    ----------
+    qclient : qiita_client.QiitaClient
+        The Qiita server client
+    jobs : list of (str, dict)
+        The job id and the validate parameters of each artifact
+    out_dir : str
+        The output directory, each job writes to a subdirectory named after
+        its job id
+    workers : int, optional
+        The number of workers, defaults to the ThreadPoolExecutor default
+
+    Returns
+    -------
+    list of (bool, list of qiita_client.ArtifactInfo, str)
+        The result of validate for each of the jobs, in the same order
+    """
+    keys = list({_metadata_key(params) for _, params in jobs
+                 if _metadata_key(params) != (None, None)})
+
+    with ThreadPoolExecutor(workers) as executor:
+        metadata = dict(zip(keys, executor.map(
+            lambda key: _fetch_metadata(qclient, key), keys)))
+
+        results = []
+        for job_id, params in jobs:
+            md, error = metadata.get(_metadata_key(params), (None, None))
+            if error:
+                results.append((False, None, error))
+                continue
+            job_dir = join(out_dir, str(job_id))
+            makedirs(job_dir, exist_ok=True)
+            results.append(executor.submit(
+                _validate, qclient, job_id, params, job_dir, md))
+
+    return [r if isinstance(r, tuple) else r.result() for r in results]
+
+
+def _start_job(qclient, job_id):
+    """Starts a validate job, returning its parameters or an error message
+
+    As the plugin does before running a task, the heartbeat of the job is
+    started, so Qiita accepts its completion.
+    """
+    try:
+        job_info = qclient.get_job_info(job_id)
+        qclient.start_heartbeat(job_id)
+    except Exception as e:
+        return None, str(e)
+    if job_info['command'] != 'Validate':
+        return None, 'Job %s is not a Validate job: %s' % (
+            job_id, job_info['command'])
+    return job_info['parameters'], None
+
+
+def _complete_job(qclient, job_id, success, artifacts_info, error_msg):
+    """Completes a job, returning the error message if it fails"""
+    try:
+        qclient.complete_job(job_id, success, error_msg=error_msg,
+                             artifacts_info=artifacts_info)
+    except Exception as e:
+        return str(e)
+    return None
+
+
+def run_batch(qclient, job_ids, out_dir, workers=None):
+    """Runs several Qiita validate jobs, completing each of them
+
+    Parameters
+    ----------
+    qclient : qiita_client.QiitaClient
+        The Qiita server client
+    job_ids : list of str
+        The ids of the validate jobs
+    out_dir : str
+        The output directory, each job writes to a subdirectory named after
+        its job id
+    workers : int, optional
+        The number of workers, defaults to the ThreadPoolExecutor default
+
+    Returns
+    -------
+    list of (bool, list of qiita_client.ArtifactInfo, str), dict of {str: str}
+        The result of each of the jobs, in the same order as job_ids
+        The error message of each of the jobs that couldn't be completed
+    """
+    with ThreadPoolExecutor(workers) as executor:
+        params = list(executor.map(
+            lambda job_id: _start_job(qclient, job_id), job_ids))
+
+    jobs = [(job_id, p) for job_id, (p, error) in zip(job_ids, params)
+            if error is None]
+    validated = iter(validate_batch(qclient, jobs, out_dir, workers))
+
+    results = []
+    failed = {}
+    for job_id, (_, error) in zip(job_ids, params):
+        result = (False, None, error) if error is not None else next(
+            validated)
+        # a job that can't be completed doesn't stop the others
+        error = _complete_job(qclient, job_id, *result)
+        if error is not None:
+            failed[job_id] = error
+        results.append(result)
+    return results, failed
+
+
+def plugin_client(plugin, url):
+    """Connects to Qiita with the credentials of a registered plugin
+
+    Parameters
+    ----------
+    plugin : qiita_client.QiitaTypePlugin
+        The plugin
+    url : str
+        The url of the Qiita server
+
+    Returns
+    -------
+    qiita_client.QiitaClient
+        The Qiita server client
+    """
+    from qiita_client import QiitaClient
+
+    config = plugin_credentials(plugin)
+    return QiitaClient(url, config.get('oauth2', 'CLIENT_ID'),
+                       config.get('oauth2', 'CLIENT_SECRET'),
+                       ca_cert=config.get('oauth2', 'SERVER_CERT',
+                                          fallback=None))
@@ -0,0 +1,270 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from hashlib import sha256
+from os import link, listdir, makedirs, remove, rename, utime, walk
+from os.path import exists, getmtime, getsize, isdir, join
+from shutil import copy2, rmtree
+from tempfile import mkdtemp
+
+from .util import get_config, PLUGIN_VERSION
+
+
+BLOCK_SIZE = 4 * 1024 * 1024
+# The size of each file or directory of an entry is kept in a file named
+# with this prefix
+SIZE_PREFIX = '.size-'
+
+
+def cache_dir():
+    """The configured cache directory
+
+    Returns
+    -------
+    str or None
+        The cache directory, None if the cache is disabled
+    """
+    path = get_config().get('cache', 'CACHE_DIR', fallback='').strip()
+    return path or None
+
+
+def file_hash(fp):
+    """Computes the sha256 of the contents of a file
+
+    Parameters
+    ----------
+    fp : str
+        The filepath
+
+    Returns
+    -------
+    str
+        The hex digest of the file contents
+    """
+    digest = sha256()
+    with open(fp, 'rb') as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(kind, content_hash, with_qiime2=False):
+    """The cache key of a result, tied to the versions that produced it
+
+    Parameters
+    ----------
+    kind : str
+        The kind of result
+    content_hash : str
+        The hash of the inputs of the result
+    with_qiime2 : bool, optional
+        Whether the result is produced by QIIME 2, so it also depends on its
+        version
+
+    Returns
+    -------
+    str
+        The key
+    """
+    versions = PLUGIN_VERSION
+    if with_qiime2:
+        import qiime2
+        versions += '\nqiime2 %s' % qiime2.__version__
+    version_hash = sha256(versions.encode('utf-8')).hexdigest()[:16]
+    return '%s-%s-%s' % (kind, version_hash, content_hash)
+
+
+def _link(src, dst):
+    """Hard links src in dst, copying it if they are in different devices"""
+    if exists(dst):
+        remove(dst)
+    try:
+        link(src, dst)
+    except OSError:
+        copy2(src, dst)
+
+
+def _link_tree(src, dst):
+    """Hard links a file or all the files in a directory tree into dst"""
+    if not isdir(src):
+        _link(src, dst)
+        return
+    for root, _, fnames in walk(src):
+        out = join(dst, root[len(src):].lstrip('/'))
+        makedirs(out, exist_ok=True)
+        for fname in fnames:
+            _link(join(root, fname), join(out, fname))
+
+
+def _size(path):
+    """The total size of the files under path, in bytes"""
+    if not isdir(path):
+        return getsize(path)
+    return sum(getsize(join(root, f))
+               for root, _, fnames in walk(path) for f in fnames)
+
+
+def _size_fp(entry, name):
+    """The file holding the size of the file or directory name of entry"""
+    return join(entry, SIZE_PREFIX + name)
+
+
+def _entry_size(entry):
+    """The total size of an entry, in bytes, from the sizes of its files"""
+    try:
+        size = 0
+        for fname in listdir(entry):
+            if fname.startswith(SIZE_PREFIX):
+                with open(join(entry, fname)) as f:
+                    size += int(f.read())
+        return size
+    except (OSError, ValueError):
+        # removed concurrently
+        return 0
+
+
+def _mtime(path):
+    """The modification time of path, 0 if it was removed concurrently"""
+    try:
+        return getmtime(path)
+    except OSError:
+        return 0
+
+
+def lookup(key, names):
+    """Finds the cache entry of key, marking it as used
+
+    Parameters
+    ----------
+    key : str
+        The cache key
+    names : list of str
+        The names of the files or directories the entry must hold
+
+    Returns
+    -------
+    str or None
+        The directory of the entry, None if it is not in the cache
+    """
+    base = cache_dir()
+    if base is None:
+        return None
+    entry = join(base, key)
+    # the size of each file is stored after the file itself
+    if not all(exists(_size_fp(entry, n)) for n in names):
+        return None
+    try:
+        # the modification time of the entries tracks their last use
+        utime(entry)
+    except OSError:
+        # evicted concurrently
+        return None
+    return entry
+
+
+def fetch(key, names, out_dir):
+    """Links the cached files of key into out_dir
+
+    Parameters
+    ----------
+    key : str
+        The cache key
+    names : list of str
+        The names of the files or directories to retrieve
+    out_dir : str
+        The directory where the files are linked
+
+    Returns
+    -------
+    bool
+        Whether all the files were in the cache
+    """
+    entry = lookup(key, names)
+    if entry is None:
+        return False
+    try:
+        for name in names:
+            with open(_size_fp(entry, name)) as f:
+                size = int(f.read())
+            _link_tree(join(entry, name), join(out_dir, name))
+            if _size(join(out_dir, name)) != size:
+                raise OSError('Incomplete cache entry %s' % key)
+    except (OSError, ValueError):
+        # the entry was evicted or removed concurrently, so the files that
+        # were linked may be incomplete
+        for name in names:
+            fp = join(out_dir, name)
+            if isdir(fp):
+                rmtree(fp, ignore_errors=True)
+            elif exists(fp):
+                remove(fp)
+        return False
+    return True
+
+
+def store(key, names, src_dir):
+    """Stores the files of src_dir in the cache under key
+
+    Parameters
+    ----------
+    key : str
+        The cache key
+    names : list of str
+        The names of the files or directories in src_dir to store
+    src_dir : str
+        The directory holding the files
+    """
+    base = cache_dir()
+    if base is None:
+        return
+    makedirs(base, exist_ok=True)
+    entry = join(base, key)
+    # the files of an existing entry may be in use by another job, so they
+    # are never replaced and only the missing ones are added
+    missing = [name for name in names if not exists(_size_fp(entry, name))]
+    if not missing:
+        return
+    tmp = mkdtemp(dir=base, prefix='.tmp-')
+    for name in missing:
+        _link_tree(join(src_dir, name), join(tmp, name))
+        # the sizes are kept with the files, so the eviction doesn't walk
+        # all the entries
+        with open(_size_fp(tmp, name), 'w') as f:
+            f.write(str(_size(join(tmp, name))))
+    try:
+        rename(tmp, entry)
+    except OSError:
+        # the entry already exists, or another job stored it in the meantime
+        for name in missing:
+            try:
+                rename(join(tmp, name), join(entry, name))
+                rename(_size_fp(tmp, name), _size_fp(entry, name))
+            except OSError:
+                # another job added the same file in the meantime
+                pass
+        rmtree(tmp)
+    evict()
+
+
+def evict():
+    """Removes the least recently used entries until the cache fits its size
+    """
+    base = cache_dir()
+    if base is None or not exists(base):
+        return
+    max_size = get_config().getfloat(
+        'cache', 'CACHE_MAX_SIZE', fallback=50) * 1024 ** 3
+    entries = [join(base, e) for e in listdir(base)
+               if not e.startswith('.tmp-')]
+    entries = sorted((_mtime(e), e, _entry_size(e)) for e in entries)
+    total = sum(size for _, _, size in entries)
+    for _, entry, size in entries:
+        if total <= max_size:
+            break
+        rmtree(entry, ignore_errors=True)
+        total -= size
@@ -0,0 +1,126 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+import h5py
+import numpy as np
+
+from .util import get_config
+
+
+def chunk_size():
+    """The configured maximum number of matrix entries read at once
+
+    Returns
+    -------
+    int
+        The chunk size
+    """
+    return get_config().getint('biom', 'CHUNK_SIZE', fallback=10000000)
+
+
+def read_ids(fp, axis):
+    """Reads the ids of an axis from a BIOM HDF5 file without the matrix
+
+    Parameters
+    ----------
+    fp : str
+        The BIOM HDF5 filepath
+    axis : {'sample', 'observation'}
+        The axis to read the ids from
+
+    Returns
+    -------
+    np.array of str
+        The ids of the axis
+    """
+    with h5py.File(fp, 'r') as f:
+        ids = f[axis]['ids'][:]
+    return np.array([i.decode('utf8') if isinstance(i, bytes) else i
+                     for i in ids], dtype=str)
+
+
+def iter_blocks(fp, axis='observation', size=None):
+    """Iterates over blocks of rows of a BIOM HDF5 compressed matrix
+
+    The observation matrix is stored in CSR format (one row per
+    observation) and the sample matrix in CSC format (one row per sample).
+
+    Parameters
+    ----------
+    fp : str
+        The BIOM HDF5 filepath
+    axis : {'observation', 'sample'}, optional
+        The axis of the rows
+    size : int, optional
+        The maximum number of entries in each block, defaults to the
+        configured chunk size. A block always holds at least one row
+
+    Yields
+    ------
+    int, np.array, np.array, np.array
+        The index of the first row of the block, and the indptr (starting at
+        zero), indices and data of the block
+    """
+    if size is None:
+        size = chunk_size()
+    with h5py.File(fp, 'r') as f:
+        grp = f[axis]['matrix']
+        indptr = grp['indptr'][:].astype(np.int64)
+        n_rows = len(indptr) - 1
+        start = 0
+        while start < n_rows:
+            # the last row whose entries fit in the block
+            stop = np.searchsorted(indptr, indptr[start] + size, side='right')
+            stop = min(max(stop - 1, start + 1), n_rows)
+            lo, hi = indptr[start], indptr[stop]
+            yield (start, indptr[start:stop + 1] - lo,
+                   grp['indices'][lo:hi], grp['data'][lo:hi])
+            start = stop
+
+
+def chunked_stats(fp, size=None):
+    """Computes the statistics of a BIOM HDF5 table in bounded memory
+
+    Parameters
+    ----------
+    fp : str
+        The BIOM HDF5 filepath
+    size : int, optional
+        The maximum number of entries read at once, defaults to the
+        configured chunk size
+
+    Returns
+    -------
+    dict of {str: np.array}
+        The same statistics as qtp_biom.fast_summary.table_stats
+    """
+    sample_ids = read_ids(fp, 'sample')
+    feature_ids = read_ids(fp, 'observation')
+    n_samples = len(sample_ids)
+    stats = {'sample_ids': sample_ids,
+             'feature_ids': feature_ids,
+             'sample_totals': np.zeros(n_samples),
+             'feature_totals': np.zeros(len(feature_ids)),
+             'sample_nnz': np.zeros(n_samples, dtype=np.int64),
+             'feature_nnz': np.zeros(len(feature_ids), dtype=np.int64)}
+
+    for start, indptr, indices, data in iter_blocks(fp, 'observation', size):
+        n_rows = len(indptr) - 1
+        rows = np.repeat(np.arange(n_rows), np.diff(indptr))
+        nonzero = data != 0
+        stop = start + n_rows
+        stats['feature_totals'][start:stop] = np.bincount(
+            rows, weights=data, minlength=n_rows)
+        stats['feature_nnz'][start:stop] = np.bincount(
+            rows[nonzero], minlength=n_rows)
+        stats['sample_totals'] += np.bincount(
+            indices, weights=data, minlength=n_samples)
+        stats['sample_nnz'] += np.bincount(
+            indices[nonzero], minlength=n_samples)
+
+    return stats
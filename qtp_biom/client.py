@@ -0,0 +1,80 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from concurrent.futures import ThreadPoolExecutor
+
+
+def get_concurrently(qclient, urls):
+    """Issues independent GET requests to Qiita concurrently
+
+    Parameters
+    ----------
+    qclient : qiita_client.QiitaClient
+        The Qiita server client
+    urls : list of str
+        The urls to retrieve
+
+    Returns
+    -------
+    list
+        The responses, in the same order as urls
+    """
+    if len(urls) < 2:
+        return [qclient.get(url) for url in urls]
+    with ThreadPoolExecutor(len(urls)) as executor:
+        return list(executor.map(qclient.get, urls))
+
+
+class AsyncStepsClient(object):
+    """Qiita client wrapper that sends the job step updates in the background
+
+    The job step updates are informative, so they are sent in order by a
+    background thread and the job doesn't wait for them. Any other call is
+    forwarded to the wrapped client. Use it as a context manager so the
+    pending updates are sent before the job finishes.
+
+    Parameters
+    ----------
+    qclient : qiita_client.QiitaClient
+        The Qiita server client
+    """
+    def __init__(self, qclient):
+        self._qclient = qclient
+        self._executor = ThreadPoolExecutor(1)
+
+    def __getattr__(self, name):
+        return getattr(self._qclient, name)
+
+    def _send_step(self, job_id, step):
+        try:
+            self._qclient.update_job_step(job_id, step)
+        except Exception:
+            # a failed step update should never fail the job
+            pass
+
+    def update_job_step(self, job_id, step):
+        """Queues a job step update
+
+        Parameters
+        ----------
+        job_id : str
+            The job id
+        step : str
+            The new step of the job
+        """
+        self._executor.submit(self._send_step, job_id, step)
+
+    def close(self):
+        """Waits until all the queued step updates are sent"""
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,80 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from concurrent.futures import ThreadPoolExecutor
+from os import makedirs, walk
+from os.path import join, relpath
+from shutil import copyfile, rmtree
+from tempfile import mkdtemp
+
+from .util import get_config
+
+
+def export_threads():
+    """The configured number of threads writing the visualization files
+
+    Returns
+    -------
+    int
+        The number of threads, 0 to export the visualization directly
+    """
+    return get_config().getint('summary', 'EXPORT_THREADS', fallback=0)
+
+
+def copy_tree(src, dst, threads):
+    """Copies a directory tree, copying its files concurrently
+
+    Parameters
+    ----------
+    src : str
+        The source directory
+    dst : str
+        The destination directory
+    threads : int
+        The number of threads copying the files
+    """
+    pairs = []
+    for root, _, fnames in walk(src):
+        out = join(dst, relpath(root, src))
+        makedirs(out, exist_ok=True)
+        pairs.extend((join(root, f), join(out, f)) for f in fnames)
+    with ThreadPoolExecutor(threads) as executor:
+        # consume the results so any error is raised
+        list(executor.map(lambda p: copyfile(*p), pairs))
+
+
+def export_visualization(visualization, out_dir, threads=None):
+    """Exports the files of a QIIME 2 visualization
+
+    QIIME 2 writes the files of the visualization one at a time, which is
+    slow on network file systems. If threads is positive, the visualization
+    is exported to a local temporary directory and its files are then
+    copied into out_dir concurrently.
+
+    Parameters
+    ----------
+    visualization : qiime2.Visualization
+        The visualization
+    out_dir : str
+        The directory where the files are written
+    threads : int, optional
+        The number of threads copying the files, defaults to EXPORT_THREADS
+        in the configuration
+    """
+    if threads is None:
+        threads = export_threads()
+    if threads <= 0:
+        visualization.export_data(out_dir)
+        return
+
+    tmp_dir = mkdtemp()
+    try:
+        visualization.export_data(join(tmp_dir, 'export'))
+        copy_tree(join(tmp_dir, 'export'), out_dir, threads)
+    finally:
+        rmtree(tmp_dir, ignore_errors=True)
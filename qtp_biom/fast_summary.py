@@ -0,0 +1,181 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from csv import writer
+from html import escape
+from os import makedirs
+from os.path import join
+
+import numpy as np
+
+
+SUMMARY_HTML = """<!DOCTYPE html>
+<html>
+  <head>
+    <meta charset="utf-8">
+    <title>Feature table summary</title>
+    <style>
+      body {font-family: sans-serif; font-size: 14px; margin: 20px;}
+      table {border-collapse: collapse; margin-bottom: 25px;}
+      th, td {border: 1px solid #ddd; padding: 4px 10px; text-align: right;}
+      th {background: #f5f5f5;}
+      .bar {background: #4a90d9; height: 12px;}
+    </style>
+  </head>
+  <body>
+    <h2>Table summary</h2>
+    <table>
+%s
+    </table>
+    <h2>Frequency per sample</h2>
+    <table>
+%s
+    </table>
+%s
+    <p><a href="sample-frequency-detail.csv">Download sample frequencies</a>
+    </p>
+    <h2>Frequency per feature</h2>
+    <table>
+%s
+    </table>
+%s
+    <p><a href="feature-frequency-detail.csv">Download feature frequencies</a>
+    </p>
+  </body>
+</html>
+"""
+
+HISTOGRAM_BINS = 20
+
+
+def table_stats(table):
+    """Computes the per sample and per feature statistics of a table
+
+    Parameters
+    ----------
+    table : biom.Table
+        The table
+
+    Returns
+    -------
+    dict of {str: np.array}
+        The ids, the total frequencies and the number of non-zero entries of
+        the samples and of the features
+    """
+    matrix = table.matrix_data
+    return {'sample_ids': table.ids(axis='sample'),
+            'feature_ids': table.ids(axis='observation'),
+            'sample_totals': np.asarray(matrix.sum(axis=0)).ravel(),
+            'feature_totals': np.asarray(matrix.sum(axis=1)).ravel(),
+            'sample_nnz': matrix.getnnz(axis=0),
+            'feature_nnz': matrix.getnnz(axis=1)}
+
+
+def _rows(values):
+    """Formats (name, value) pairs as HTML table rows"""
+    return '\n'.join('      <tr><th>%s</th><td>%s</td></tr>' % (
+        escape(name), escape(str(value))) for name, value in values)
+
+
+def _distribution(totals):
+    """Formats the quantiles of a frequency distribution as table rows"""
+    if not len(totals):
+        return _rows([('Count', 0)])
+    q = np.percentile(totals, [0, 25, 50, 75, 100])
+    return _rows([('Minimum frequency', '%.1f' % q[0]),
+                  ('1st quartile', '%.1f' % q[1]),
+                  ('Median frequency', '%.1f' % q[2]),
+                  ('3rd quartile', '%.1f' % q[3]),
+                  ('Maximum frequency', '%.1f' % q[4]),
+                  ('Mean frequency', '%.1f' % totals.mean())])
+
+
+def _histogram(totals):
+    """Formats the histogram of a frequency distribution as an HTML table"""
+    if not len(totals):
+        return ''
+    counts, edges = np.histogram(totals, bins=HISTOGRAM_BINS)
+    widths = np.round(300 * counts / max(counts.max(), 1)).astype(int)
+    rows = '\n'.join(
+        '      <tr><td>%.1f - %.1f</td><td>%d</td>'
+        '<td style="text-align: left"><div class="bar" '
+        'style="width: %dpx"></div></td></tr>' % (lo, hi, c, w)
+        for lo, hi, c, w in zip(edges[:-1], edges[1:], counts, widths))
+    return ('    <table>\n      <tr><th>Frequency</th><th>Count</th>'
+            '<th></th></tr>\n%s\n    </table>' % rows)
+
+
+def _write_detail(fp, ids, totals, metadata=None):
+    """Writes the frequency of each id as a CSV, sorted by frequency, joined
+    with the metadata of the ids, if given"""
+    order = np.argsort(-totals, kind='stable')
+    ids = np.asarray(ids)[order]
+    header = ['', 'frequency']
+    rows = zip(ids, totals[order].tolist())
+    if metadata is not None:
+        md = metadata.reindex(ids).fillna('')
+        header.extend(str(c) for c in md.columns)
+        rows = ((i, t) + tuple(values) for (i, t), values in
+                zip(rows, md.itertuples(index=False)))
+    with open(fp, 'w', newline='') as f:
+        w = writer(f)
+        w.writerow(header)
+        w.writerows(rows)
+
+
+def render_summary(stats, out_dir, metadata=None):
+    """Writes the HTML summary of the table statistics into out_dir
+
+    The table statistics don't depend on the metadata, so only the join
+    with the metadata and the rendering are repeated when it changes.
+
+    Parameters
+    ----------
+    stats : dict of {str: np.array}
+        The statistics, as returned by table_stats
+    out_dir : str
+        The directory where the summary is written
+    metadata : pd.DataFrame, optional
+        The sample metadata, indexed by sample id, added to the per sample
+        details
+
+    Returns
+    -------
+    str
+        The name of the index file of the summary
+    """
+    makedirs(out_dir, exist_ok=True)
+
+    n_samples = len(stats['sample_ids'])
+    n_features = len(stats['feature_ids'])
+    nnz = int(stats['sample_nnz'].sum())
+    size = n_samples * n_features
+    summary = [
+        ('Number of samples', n_samples),
+        ('Number of features', n_features),
+        ('Total frequency', '%.1f' % stats['sample_totals'].sum()),
+        ('Non-zero entries', nnz),
+        ('Sparsity', '%.4f' % (1 - nnz / size) if size else 'NA')]
+    if metadata is not None:
+        summary.append(('Samples with metadata', int(np.isin(
+            stats['sample_ids'], metadata.index.astype(str)).sum())))
+    summary = _rows(summary)
+
+    with open(join(out_dir, 'index.html'), 'w') as f:
+        f.write(SUMMARY_HTML % (
+            summary,
+            _distribution(stats['sample_totals']),
+            _histogram(stats['sample_totals']),
+            _distribution(stats['feature_totals']),
+            _histogram(stats['feature_totals'])))
+    _write_detail(join(out_dir, 'sample-frequency-detail.csv'),
+                  stats['sample_ids'], stats['sample_totals'], metadata)
+    _write_detail(join(out_dir, 'feature-frequency-detail.csv'),
+                  stats['feature_ids'], stats['feature_totals'])
+
+    return 'index.html'
@@ -0,0 +1,123 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+import re
+from gzip import GzipFile
+from mmap import mmap, ACCESS_READ
+from os import stat
+from os.path import exists
+
+from .util import atomic_write, file_signature, get_config
+
+
+# The sequence id is the first word of each header line
+HEADER_RE = re.compile(rb'^>[ \t]*(\S*)', re.M)
+GZIP_MAGIC = b'\x1f\x8b'
+BLOCK_SIZE = 4 * 1024 * 1024
+INDEX_SUFFIX = '.qtpids'
+INDEX_HEADER = '# qtp-biom sequence ids v1'
+
+
+def _is_gzip(fp):
+    """Whether fp is a gzip compressed file"""
+    with open(fp, 'rb') as f:
+        return f.read(2) == GZIP_MAGIC
+
+
+def _scan_mmap(fp):
+    """Scans the header lines of an uncompressed FASTA file"""
+    with open(fp, 'rb') as f:
+        if not stat(fp).st_size:
+            # empty files can't be memory-mapped
+            return []
+        with mmap(f.fileno(), 0, access=ACCESS_READ) as mm:
+            return [m.group(1) for m in HEADER_RE.finditer(mm)]
+
+
+def _scan_gzip(fp):
+    """Scans the header lines of a gzip compressed FASTA file"""
+    ids = []
+    leftover = b''
+    with GzipFile(fp, 'rb') as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b''):
+            block = leftover + block
+            # only complete lines are scanned, the rest goes with next block
+            end = block.rfind(b'\n') + 1
+            ids.extend(m.group(1) for m in HEADER_RE.finditer(block, 0, end))
+            leftover = block[end:]
+    ids.extend(m.group(1) for m in HEADER_RE.finditer(leftover))
+    return ids
+
+
+def _index_signature(fp):
+    """The signature identifying the contents of fp in its index"""
+    return '%d %d' % file_signature(fp)
+
+
+def _read_index(fp):
+    """Reads the sidecar id index of fp, None if missing or out of date"""
+    index_fp = fp + INDEX_SUFFIX
+    if not exists(index_fp):
+        return None
+    with open(index_fp, encoding='utf8') as f:
+        header = f.readline().rstrip('\n')
+        signature = f.readline().rstrip('\n')
+        if header != INDEX_HEADER or signature != _index_signature(fp):
+            return None
+        count = int(f.readline())
+        ids = f.read().split('\n')[:count]
+    return ids if len(ids) == count else None
+
+
+def _write_index(fp, ids):
+    """Writes the sidecar id index of fp, if its directory is writable"""
+    try:
+        with atomic_write(fp + INDEX_SUFFIX, encoding='utf8') as f:
+            f.write('%s\n%s\n%d\n' % (INDEX_HEADER, _index_signature(fp),
+                                      len(ids)))
+            f.write('\n'.join(ids))
+    except OSError:
+        # the index is only an optimization
+        pass
+
+
+def fasta_ids(fp, use_index=None):
+    """Reads the sequence ids of a FASTA file without parsing the sequences
+
+    Only the header lines are scanned, over a memory map of the file or, for
+    gzip compressed files, over the decompressed stream.
+
+    Parameters
+    ----------
+    fp : str
+        The FASTA filepath, optionally gzip compressed
+    use_index : bool, optional
+        Whether to read and write a sidecar index of the ids next to the
+        file, so later reads skip the scan. Defaults to the USE_ID_INDEX
+        configuration value
+
+    Returns
+    -------
+    list of str
+        The sequence ids, i.e. the first word of each header line, in the
+        order they appear in the file
+    """
+    if use_index is None:
+        use_index = get_config().getboolean(
+            'fasta', 'USE_ID_INDEX', fallback=False)
+    if use_index:
+        ids = _read_index(fp)
+        if ids is not None:
+            return ids
+
+    raw = _scan_gzip(fp) if _is_gzip(fp) else _scan_mmap(fp)
+    ids = [i.decode('utf8') for i in raw]
+
+    if use_index:
+        _write_index(fp, ids)
+    return ids
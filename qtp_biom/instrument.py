@@ -0,0 +1,145 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from contextlib import contextmanager
+from json import dump
+from os import environ
+from os.path import join
+from resource import getrusage, RUSAGE_SELF
+from sys import platform
+from threading import Lock
+from time import perf_counter, process_time, thread_time
+
+
+# QTP_BIOM_PROFILE=1 writes the profile of the job into its output directory,
+# QTP_BIOM_PROFILE=steps also reports each stage through the job step
+PROFILE_ENV = 'QTP_BIOM_PROFILE'
+PROFILE_FN = 'qtp_biom_profile.json'
+
+
+def peak_rss():
+    """The peak resident set size of the current process, in MB
+
+    Returns
+    -------
+    float
+        The peak resident set size
+    """
+    peak = getrusage(RUSAGE_SELF).ru_maxrss
+    # Linux reports KB and macOS bytes
+    return peak / 1024 ** (2 if platform == 'darwin' else 1)
+
+
+def measured(func, args):
+    """Runs func(*args) measuring the resources used by the calling thread
+
+    Parameters
+    ----------
+    func : callable
+        The function to run
+    args : tuple
+        The arguments of func
+
+    Returns
+    -------
+    object, (float, float, float)
+        The result of func
+        The wall time and the CPU time, in seconds, and the peak RSS, in MB
+    """
+    wall, cpu = perf_counter(), thread_time()
+    result = func(*args)
+    return result, (perf_counter() - wall, thread_time() - cpu, peak_rss())
+
+
+class Profiler(object):
+    """Records the wall time, CPU time and peak memory of the job stages
+
+    The profiler is disabled unless the QTP_BIOM_PROFILE environment
+    variable is set, in which case recording a stage only costs reading a
+    few clocks.
+
+    Parameters
+    ----------
+    qclient : qiita_client.QiitaClient, optional
+        The Qiita server client used to report the stages
+    job_id : str, optional
+        The job id
+    """
+    def __init__(self, qclient=None, job_id=None):
+        mode = environ.get(PROFILE_ENV, '').strip().lower()
+        self.enabled = mode not in ('', '0', 'false', 'no', 'off')
+        self.report_steps = mode == 'steps' and qclient is not None
+        self.records = []
+        self._qclient = qclient
+        self._job_id = job_id
+        self._lock = Lock()
+
+    def record(self, name, wall_time, cpu_time, peak_rss):
+        """Records the resources used by a stage
+
+        Parameters
+        ----------
+        name : str
+            The stage name
+        wall_time : float
+            The wall time, in seconds
+        cpu_time : float
+            The CPU time, in seconds
+        peak_rss : float
+            The peak resident set size at the end of the stage, in MB
+        """
+        with self._lock:
+            self.records.append({'stage': name,
+                                 'wall_time': round(wall_time, 6),
+                                 'cpu_time': round(cpu_time, 6),
+                                 'peak_rss_mb': round(peak_rss, 3)})
+        if self.report_steps:
+            self._qclient.update_job_step(
+                self._job_id, "Profile: %s took %.2fs (%.2fs CPU), peak "
+                "memory %.1f MB" % (name, wall_time, cpu_time, peak_rss))
+
+    @contextmanager
+    def stage(self, name):
+        """Context manager recording the resources used by its block
+
+        Parameters
+        ----------
+        name : str
+            The stage name
+        """
+        if not self.enabled:
+            yield
+            return
+        wall, cpu = perf_counter(), process_time()
+        try:
+            yield
+        finally:
+            self.record(name, perf_counter() - wall, process_time() - cpu,
+                        peak_rss())
+
+    def write(self, out_dir):
+        """Writes the recorded stages as JSON into out_dir
+
+        Parameters
+        ----------
+        out_dir : str
+            The path to the job's output directory
+
+        Returns
+        -------
+        str or None
+            The filepath of the profile, None if the profiler is disabled
+        """
+        if not self.enabled:
+            return None
+        fp = join(out_dir, PROFILE_FN)
+        with self._lock:
+            with open(fp, 'w') as f:
+                dump({'job_id': self._job_id, 'stages': self.records}, f,
+                     indent=2)
+        return fp
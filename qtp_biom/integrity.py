@@ -0,0 +1,137 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+import h5py
+import numpy as np
+
+from .chunked import chunk_size, read_ids
+from .util import format_ids
+
+
+CORRUPT_ERROR = 'The BIOM table is corrupt or inconsistent: %s'
+
+# the compressed matrix of each axis is indexed by the ids of the other one
+OTHER_AXIS = {'observation': 'sample', 'sample': 'observation'}
+
+
+def _check_ids(ids, axis):
+    """Checks that the ids of an axis are unique"""
+    uniques, counts = np.unique(ids, return_counts=True)
+    if len(uniques) != len(ids):
+        return 'duplicated %s ids: %s' % (
+            axis, format_ids(uniques[counts > 1].tolist()))
+    return ''
+
+
+def _check_matrix(grp, axis, n_rows, n_cols, size):
+    """Checks the compressed matrix of an axis, reading it in chunks
+
+    Parameters
+    ----------
+    grp : h5py.Group
+        The matrix group of the axis
+    axis : {'observation', 'sample'}
+        The axis of the rows of the matrix
+    n_rows : int
+        The number of ids of the axis
+    n_cols : int
+        The number of ids of the other axis
+    size : int
+        The maximum number of entries read at once
+
+    Returns
+    -------
+    str, int, float
+        The error message, empty if the matrix is valid
+        The number of stored entries and the sum of their values
+    """
+    indptr = grp['indptr'][:]
+    if len(indptr) != n_rows + 1:
+        return ('%s matrix has %d index pointers for %d %s ids' % (
+            axis, len(indptr), n_rows, axis)), 0, 0
+    if indptr[0] != 0 or (np.diff(indptr) < 0).any():
+        return '%s matrix index pointers are not increasing' % axis, 0, 0
+    nnz = int(indptr[-1])
+    if len(grp['indices']) != nnz or len(grp['data']) != nnz:
+        return ('%s matrix has %d entries but %d indices and %d values' % (
+            axis, nnz, len(grp['indices']), len(grp['data']))), 0, 0
+
+    total = 0
+    for start in range(0, nnz, size):
+        indices = grp['indices'][start:start + size]
+        if len(indices) and (indices.min() < 0 or indices.max() >= n_cols):
+            return ('%s matrix has indices out of the range of the %d %s ids'
+                    % (axis, n_cols, OTHER_AXIS[axis])), 0, 0
+        data = grp['data'][start:start + size]
+        if not np.isfinite(data).all():
+            return '%s matrix has NaN or infinite counts' % axis, 0, 0
+        if (data < 0).any():
+            return '%s matrix has negative counts' % axis, 0, 0
+        total += data.sum(dtype=np.float64)
+    return '', nnz, total
+
+
+def check_biom(fp, size=None):
+    """Checks the structure of a BIOM HDF5 file without loading the matrix
+
+    The ids, the shape and both compressed matrices are checked with
+    vectorized passes over chunks of the datasets, so corrupt files are
+    reported before any expensive step of the job. Files that are not HDF5
+    (JSON or TSV tables) are left to the BIOM parser.
+
+    Parameters
+    ----------
+    fp : str
+        The BIOM filepath
+    size : int, optional
+        The maximum number of entries read at once, defaults to the
+        configured chunk size
+
+    Returns
+    -------
+    str
+        The error message, empty if the file is valid
+    """
+    if not h5py.is_hdf5(fp):
+        return ''
+    if size is None:
+        size = chunk_size()
+
+    try:
+        ids = {axis: read_ids(fp, axis) for axis in OTHER_AXIS}
+        for axis in OTHER_AXIS:
+            error = _check_ids(ids[axis], axis)
+            if error:
+                return CORRUPT_ERROR % error
+
+        n_obs, n_samples = len(ids['observation']), len(ids['sample'])
+        with h5py.File(fp, 'r') as f:
+            shape = tuple(int(i) for i in f.attrs.get(
+                'shape', (n_obs, n_samples)))
+            if shape != (n_obs, n_samples):
+                return CORRUPT_ERROR % (
+                    'the shape %s does not match the %d observation and %d '
+                    'sample ids' % (shape, n_obs, n_samples))
+
+            totals = {}
+            for axis, n_rows, n_cols in (('observation', n_obs, n_samples),
+                                         ('sample', n_samples, n_obs)):
+                error, nnz, total = _check_matrix(
+                    f[axis]['matrix'], axis, n_rows, n_cols, size)
+                if error:
+                    return CORRUPT_ERROR % error
+                totals[axis] = (nnz, total)
+    except (KeyError, OSError) as e:
+        return CORRUPT_ERROR % ('unable to read the file (%s)' % e)
+
+    (obs_nnz, obs_total), (samp_nnz, samp_total) = (
+        totals['observation'], totals['sample'])
+    if obs_nnz != samp_nnz or not np.isclose(obs_total, samp_total):
+        return CORRUPT_ERROR % ('the observation and sample matrices hold '
+                                'different values')
+    return ''
@@ -0,0 +1,181 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from collections import namedtuple
+from os.path import getsize
+
+import h5py
+
+from .chunked import chunk_size
+from .util import get_config
+
+
+Plan = namedtuple('Plan', ['name', 'backend', 'save_qza', 'estimate'])
+
+# Bytes of a loaded matrix entry (float64 value and int32 index) and of a
+# loaded id (the python string and its position in the index arrays)
+ENTRY_BYTES = 12
+ID_BYTES = 100
+# Copies of the table held at once by the QIIME 2 import and summarize
+IN_MEMORY_COPIES = 3
+# Copies of the table held at once when saving the qza
+QZA_COPIES = 2
+# Bytes in memory per byte of a JSON or TSV table
+TEXT_TABLE_FACTOR = 4
+
+
+def memory_budget():
+    """The configured memory budget of the jobs, in bytes
+
+    Returns
+    -------
+    float
+        The memory budget, 0 if unlimited
+    """
+    return get_config().getfloat(
+        'summary', 'MEMORY_BUDGET', fallback=0) * 1024 ** 3
+
+
+def table_size(fp):
+    """Reads the shape and number of entries of a BIOM HDF5 table
+
+    Parameters
+    ----------
+    fp : str
+        The BIOM HDF5 filepath
+
+    Returns
+    -------
+    int, int, int
+        The number of observations, samples and non-zero entries
+
+    Notes
+    -----
+    The shape and nnz attributes are optional in the files written by some
+    tools, so they are derived from the ids and the index pointers if
+    missing
+    """
+    with h5py.File(fp, 'r') as f:
+        if 'shape' in f.attrs:
+            n_obs, n_samples = (int(i) for i in f.attrs['shape'])
+        else:
+            n_obs = len(f['observation/ids'])
+            n_samples = len(f['sample/ids'])
+        if 'nnz' in f.attrs:
+            nnz = int(f.attrs['nnz'])
+        else:
+            indptr = f['observation/matrix/indptr']
+            nnz = int(indptr[-1]) if len(indptr) else 0
+    return n_obs, n_samples, nnz
+
+
+def estimate_memory(fp):
+    """Estimates the peak memory of each of the summary paths of a table
+
+    Parameters
+    ----------
+    fp : str
+        The BIOM filepath
+
+    Returns
+    -------
+    dict of {str: float}
+        The estimated peak memory, in bytes, of the in-memory path, of
+        loading the table to save the qza and of the chunked summary
+    """
+    if not h5py.is_hdf5(fp):
+        # text tables can only be parsed fully in memory
+        table = getsize(fp) * TEXT_TABLE_FACTOR
+        return {'in-memory': table * IN_MEMORY_COPIES,
+                'qza': table * QZA_COPIES,
+                'chunked': table}
+
+    n_obs, n_samples, nnz = table_size(fp)
+    ids = (n_obs + n_samples) * ID_BYTES
+    table = nnz * ENTRY_BYTES + ids
+    # one block of each matrix dataset and the per id statistics
+    chunked = min(nnz, chunk_size()) * ENTRY_BYTES * 2 + ids * 2
+    return {'in-memory': table * IN_MEMORY_COPIES,
+            'qza': table * QZA_COPIES,
+            'chunked': chunked}
+
+
+def plan_summary(fp, backend=None, save_qza=True, budget=None):
+    """Chooses how to summarize a table within the memory budget
+
+    The preferred path is the configured summary backend with the qza. If
+    it doesn't fit the budget the table is summarized in chunks with the
+    native backend and, if loading it to save the qza doesn't fit either,
+    the qza is not generated.
+
+    Parameters
+    ----------
+    fp : str
+        The BIOM filepath
+    backend : {'qiime2', 'native'}, optional
+        The preferred summary backend, defaults to SUMMARY_BACKEND in the
+        configuration
+    save_qza : bool, optional
+        Whether the qza is needed
+    budget : float, optional
+        The memory budget, in bytes, defaults to MEMORY_BUDGET in the
+        configuration. 0 means unlimited
+
+    Returns
+    -------
+    Plan
+        The name of the path, the summary backend, whether to save the qza
+        and the estimated peak memory, in bytes, None if the budget is
+        unlimited
+    """
+    if backend is None:
+        backend = get_config().get('summary', 'SUMMARY_BACKEND',
+                                   fallback='qiime2').strip()
+    if budget is None:
+        budget = memory_budget()
+    if not budget:
+        # any path fits, so there is no need to read the table
+        return Plan('in-memory' if backend == 'qiime2' else 'chunked',
+                    backend, save_qza, None)
+    est = estimate_memory(fp)
+    qza = est['qza'] if save_qza else 0
+
+    if backend == 'qiime2':
+        in_memory = max(est['in-memory'], qza)
+        if in_memory <= budget:
+            return Plan('in-memory', 'qiime2', save_qza, in_memory)
+    chunked = max(est['chunked'], qza)
+    if chunked <= budget:
+        return Plan('chunked', 'native', save_qza, chunked)
+    return Plan('summary-only', 'native', False, est['chunked'])
+
+
+def describe_plan(plan, budget=None):
+    """Describes a plan for the job step
+
+    Parameters
+    ----------
+    plan : Plan
+        The plan
+    budget : float, optional
+        The memory budget, in bytes, defaults to MEMORY_BUDGET in the
+        configuration
+
+    Returns
+    -------
+    str
+        The description of the plan
+    """
+    if plan.estimate is None:
+        return '%s summary (unlimited memory budget)' % plan.name
+    if budget is None:
+        budget = memory_budget()
+    gb = 1024 ** 3
+    return '%s summary (estimated peak memory %.2f GB, budget %s)' % (
+        plan.name, plan.estimate / gb,
+        '%.2f GB' % (budget / gb) if budget else 'unlimited')
@@ -0,0 +1,141 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+import numpy as np
+
+from .util import format_ids
+
+
+UNKNOWN_SAMPLES_ERROR = (
+    'The sample ids in the BIOM table do not match the ones in the prep '
+    'information. Please, provide the column "run_prefix" in the prep '
+    'information to map the existing sample ids to the prep information '
+    'sample ids.')
+
+MISSING_SAMPLES_ERROR = ('Your prep information is missing samples that are '
+                         'present in your BIOM table: %s')
+
+DUPLICATED_SAMPLES_ERROR = ('Several samples of your BIOM table are mapped '
+                            'to the same sample of your prep information: '
+                            '%s')
+
+
+def _lookup(keys, values, queries):
+    """Looks up queries in keys using a sorted index
+
+    If a key is duplicated, its last value is used, as when building a dict
+    from the keys and values.
+
+    Parameters
+    ----------
+    keys : np.array of str
+        The keys of the index
+    values : np.array of str
+        The value of each key
+    queries : np.array of str
+        The keys to look up
+
+    Returns
+    -------
+    np.array of str, np.array of bool
+        The value of each query, and whether each query was found
+    """
+    if not len(keys):
+        return queries.copy(), np.zeros(len(queries), dtype=bool)
+    # the sort is stable, so the last of the equal keys is the last one in
+    # keys, right before the position where the query would be inserted
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    pos = np.maximum(np.searchsorted(sorted_keys, queries, side='right') - 1,
+                     0)
+    found = sorted_keys[pos] == queries
+    return values[order[pos]], found
+
+
+def duplicated_samples_error(biom_ids, new_ids):
+    """Checks that each BIOM sample id is mapped to a different sample id
+
+    Parameters
+    ----------
+    biom_ids : np.array of str
+        The sample ids of the BIOM table
+    new_ids : np.array of str
+        The sample id each BIOM sample id is mapped to
+
+    Returns
+    -------
+    str
+        The error message naming the BIOM sample ids mapped to the same
+        sample id, empty if the new ids are unique
+    """
+    uniques, inverse, counts = np.unique(
+        new_ids, return_inverse=True, return_counts=True)
+    if (counts < 2).all():
+        return ''
+    duplicated = ['%s (%s)' % (new_id, ', '.join(
+                  biom_ids[inverse == i].tolist()))
+                  for i, new_id in enumerate(uniques.tolist())
+                  if counts[i] > 1]
+    return DUPLICATED_SAMPLES_ERROR % format_ids(duplicated)
+
+
+def map_sample_ids(biom_ids, metadata):
+    """Maps the BIOM sample ids to the metadata sample ids
+
+    Two strategies are tried: the "run_prefix" column of the metadata holds
+    the BIOM sample ids or, otherwise, the BIOM sample ids are the metadata
+    sample ids without the study prefix.
+
+    Parameters
+    ----------
+    biom_ids : np.array of str
+        The sample ids of the BIOM table
+    metadata : dict of {str: dict}
+        The metadata, keyed by sample id
+
+    Returns
+    -------
+    np.array of str or None, str
+        The new sample ids, in the same order as biom_ids, or None if the
+        BIOM sample ids are already valid or can't be mapped
+        The error message, empty if the ids are valid or could be mapped to
+        different metadata sample ids
+    """
+    biom_ids = np.asarray(biom_ids, dtype=str)
+    md_ids = np.array(list(metadata), dtype=str)
+    _, valid = _lookup(md_ids, md_ids, biom_ids)
+    if valid.all():
+        return None, ''
+    if not len(md_ids):
+        return None, UNKNOWN_SAMPLES_ERROR
+
+    first = metadata[md_ids[0]]
+    if 'run_prefix' in first:
+        # Attempt 1: the user provided the run prefix column - in this case
+        # the run prefix column holds the sample ids present in the BIOM file
+        prefixes = np.array([v['run_prefix'] for v in metadata.values()],
+                            dtype=str)
+        new_ids, found = _lookup(prefixes, md_ids, biom_ids)
+        if not found.all():
+            return None, MISSING_SAMPLES_ERROR % format_ids(
+                biom_ids[~found].tolist())
+        error_msg = duplicated_samples_error(biom_ids, new_ids)
+        if error_msg:
+            return None, error_msg
+        return new_ids, ''
+
+    # Attempt 2: the sample ids in the BIOM table are the same that in the
+    # prep template but without the prefix
+    prefix = md_ids[0].split('.', 1)[0]
+    prefixed = np.char.add('%s.' % prefix, biom_ids)
+    _, found = _lookup(md_ids, md_ids, prefixed)
+    if not found.all():
+        # There is nothing we can do. The samples in the BIOM table do not
+        # match the ones in the prep template and we can't fix it
+        return None, UNKNOWN_SAMPLES_ERROR
+    return prefixed, ''
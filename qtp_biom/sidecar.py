@@ -0,0 +1,148 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from hashlib import sha256
+from os.path import exists
+
+import numpy as np
+
+from .util import atomic_write, file_signature, get_config
+
+
+SIDECAR_SUFFIX = '.qtpstats.npz'
+# increase it whenever the contents of the statistics files change
+SIDECAR_VERSION = 1
+STATS_KEYS = ('sample_ids', 'feature_ids', 'sample_totals', 'feature_totals',
+              'sample_nnz', 'feature_nnz')
+
+
+def sidecar_enabled():
+    """Whether the statistics sidecars are enabled in the configuration
+
+    Returns
+    -------
+    bool
+        Whether to read and write the sidecars
+    """
+    return get_config().getboolean('biom', 'STATS_SIDECAR', fallback=False)
+
+
+def _checksum(stats):
+    """The sha256 of the statistics arrays"""
+    digest = sha256()
+    for key in STATS_KEYS:
+        arr = np.ascontiguousarray(stats[key])
+        digest.update(arr.dtype.str.encode('ascii'))
+        digest.update(arr.tobytes())
+    return digest.hexdigest()
+
+
+def save_stats(fp, stats, content_hash, signature=()):
+    """Saves the statistics of a table to a versioned, checksummed npz file
+
+    Parameters
+    ----------
+    fp : str
+        The output filepath
+    stats : dict of {str: np.array}
+        The statistics of the table, see qtp_biom.fast_summary.table_stats
+    content_hash : str
+        The sha256 of the table contents
+    signature : tuple of int, optional
+        The signature of the table file, see qtp_biom.util.file_signature,
+        if the statistics are only valid while the file is unchanged
+
+    Raises
+    ------
+    OSError
+        If the file can't be written
+    """
+    # the ids are stored as fixed width strings, so no pickling is needed
+    arrays = {key: np.asarray(stats[key], dtype=str if key.endswith('ids')
+                              else None) for key in STATS_KEYS}
+    with atomic_write(fp, 'wb') as f:
+        np.savez(f, version=SIDECAR_VERSION,
+                 signature=np.array(signature, dtype=np.int64),
+                 checksum=_checksum(arrays), content_hash=content_hash,
+                 **arrays)
+
+
+def load_stats(fp, signature=()):
+    """Loads the statistics of a table saved by save_stats
+
+    Parameters
+    ----------
+    fp : str
+        The filepath
+    signature : tuple of int, optional
+        The current signature of the table file, if the statistics were
+        saved with one
+
+    Returns
+    -------
+    (dict of {str: np.array}, str) or None
+        The statistics of the table and the sha256 of the table contents.
+        None if the file doesn't exist, is from another version, is
+        corrupted or doesn't match signature
+    """
+    if not exists(fp):
+        return None
+    try:
+        with np.load(fp, allow_pickle=False) as npz:
+            if (int(npz['version']) != SIDECAR_VERSION or
+                    not np.array_equal(npz['signature'], signature)):
+                return None
+            stats = {key: npz[key] for key in STATS_KEYS}
+            checksum = str(npz['checksum'])
+            content_hash = str(npz['content_hash'])
+    except (OSError, ValueError, KeyError):
+        return None
+    if checksum != _checksum(stats):
+        return None
+    return stats, content_hash
+
+
+def read_sidecar(biom_fp):
+    """Reads the statistics sidecar of a BIOM table
+
+    Parameters
+    ----------
+    biom_fp : str
+        The BIOM filepath
+
+    Returns
+    -------
+    (dict of {str: np.array}, str) or None
+        The statistics of the table, see qtp_biom.fast_summary.table_stats,
+        and the sha256 of the table contents. None if the sidecar doesn't
+        exist, is from another version, or doesn't match the table
+    """
+    return load_stats(biom_fp + SIDECAR_SUFFIX, file_signature(biom_fp))
+
+
+def write_sidecar(biom_fp, stats, content_hash):
+    """Writes the statistics sidecar of a BIOM table, if possible
+
+    The sidecar is written next to the table, so nothing is written if its
+    directory is not writable.
+
+    Parameters
+    ----------
+    biom_fp : str
+        The BIOM filepath
+    stats : dict of {str: np.array}
+        The statistics of the table, see qtp_biom.fast_summary.table_stats
+    content_hash : str
+        The sha256 of the table contents
+    """
+    try:
+        save_stats(biom_fp + SIDECAR_SUFFIX, stats, content_hash,
+                   file_signature(biom_fp))
+    except OSError:
+        # the sidecar is only an optimization
+        pass
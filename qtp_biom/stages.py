@@ -0,0 +1,138 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from queue import Queue, Empty
+
+from .instrument import measured
+
+
+STAGE_DIED_ERROR = ('The %s stage was terminated unexpectedly, probably '
+                    'because it ran out of memory')
+
+
+def _run_stage(queue, idx, func, args):
+    """Runs a stage in a thread and reports its outcome to queue"""
+    try:
+        queue.put((idx, func(*args), None))
+    except Exception as e:
+        queue.put((idx, None, e))
+
+
+def _stage_done(queue, idx, future):
+    """Reports the outcome of a stage run in a process to queue"""
+    exc = future.exception()
+    queue.put((idx, None if exc is not None else future.result(), exc))
+
+
+def _terminate(executor):
+    """Stops a process pool, terminating the stages still running"""
+    # ProcessPoolExecutor.shutdown waits for the running calls to finish,
+    # so the workers of the abandoned stages are terminated first
+    for process in list((executor._processes or {}).values()):
+        process.terminate()
+    executor.shutdown(wait=False)
+
+
+def run_stages(stages, profiler=None):
+    """Runs independent validation stages concurrently
+
+    Each stage is a function returning a tuple (error message, result),
+    where the error message is empty if the stage succeeds. The stages run
+    in threads, except the ones flagged as CPU-bound, which run in separate
+    processes. As soon as a stage fails the remaining ones are abandoned. A
+    CPU-bound stage whose process dies is reported as a failed stage.
+
+    Parameters
+    ----------
+    stages : list of (callable, tuple, bool)
+        The function, its arguments and whether it is CPU-bound for each of
+        the stages
+    profiler : qtp_biom.instrument.Profiler, optional
+        The profiler recording the resources used by each stage
+
+    Returns
+    -------
+    str, list
+        The error messages of the failed stages, joined by new lines, or an
+        empty string if all the stages succeeded
+        The results of the stages, in the same order as stages
+
+    Raises
+    ------
+    Exception
+        Any exception raised by a stage is re-raised
+    """
+    profile = profiler is not None and profiler.enabled
+    names = [func.__name__.lstrip('_') for func, _, _ in stages]
+    if profile:
+        # the stages are measured where they run, so the CPU-bound ones are
+        # measured in their own process
+        stages = [(measured, (func, args), cpu_bound)
+                  for func, args, cpu_bound in stages]
+
+    def outcome(idx, res, exc):
+        """The error message and result of a stage, raising its exception"""
+        if isinstance(exc, BrokenProcessPool):
+            # the process was killed, e.g. by the OOM killer
+            return STAGE_DIED_ERROR % names[idx], None
+        if exc is not None:
+            raise exc
+        return res[0] if profile else res
+
+    queue = Queue()
+    results = [None] * len(stages)
+    errors = {}
+
+    # the job is multithreaded (e.g. the job step updates are sent by a
+    # background thread), so the processes are started from a fork server
+    # instead of forking the job itself, which could deadlock the children
+    processes = None
+    if any(cpu_bound for _, _, cpu_bound in stages):
+        processes = ProcessPoolExecutor(
+            sum(cpu_bound for _, _, cpu_bound in stages),
+            mp_context=get_context('forkserver'))
+    threads = ThreadPoolExecutor(max(len(stages), 1))
+
+    try:
+        for idx, (func, args, cpu_bound) in enumerate(stages):
+            if cpu_bound:
+                processes.submit(func, *args).add_done_callback(
+                    lambda future, idx=idx: _stage_done(queue, idx, future))
+            else:
+                threads.submit(_run_stage, queue, idx, func, args)
+
+        pending = len(stages)
+        while pending:
+            idx, res, exc = queue.get()
+            pending -= 1
+            if profile and exc is None:
+                profiler.record(names[idx], *res[1])
+            error_msg, results[idx] = outcome(idx, res, exc)
+            if error_msg:
+                errors[idx] = error_msg
+                # fail fast, but report the errors of the stages that have
+                # already finished
+                while True:
+                    try:
+                        idx, res, exc = queue.get_nowait()
+                    except Empty:
+                        break
+                    if exc is None or isinstance(exc, BrokenProcessPool):
+                        error_msg = outcome(idx, res, exc)[0]
+                        if error_msg:
+                            errors[idx] = error_msg
+                break
+    finally:
+        if processes is not None:
+            _terminate(processes)
+        threads.shutdown(wait=False)
+
+    return '\n'.join(errors[idx] for idx in sorted(errors)), results
@@ -7,15 +7,20 @@
 # -----------------------------------------------------------------------------
 
 from os import remove
-from os.path import join, basename
+from os.path import join, basename, exists
 from json import dumps
-import pandas as pd
-from tempfile import mkstemp
+from hashlib import sha256
+import re
 
-import qiime2
-from qiime2.plugins.feature_table.visualizers import summarize
-from skbio.tree import TreeNode
-from biom import load_table
+from . import cache
+from .export import export_visualization
+from .fast_summary import render_summary
+from .instrument import Profiler
+from .planner import describe_plan, plan_summary
+from .sidecar import load_stats, save_stats
+from .table import TableContext
+from .tree import cached_tree_stats
+from .util import get_config
 
 
 Q2_INDEX = """<!DOCTYPE html>
@@ -27,17 +32,33 @@ Q2_INDEX = """<!DOCTYPE html>
   </body>
 </html>"""
 
+# The table statistics and the qza are kept in the cache with these names
+TABLE_STATS_FN = 'table-stats.npz'
+QZA_FN = 'feature-table.qza'
 
-def _generate_metadata_file(response, out_fp):
+# QIIME 2 considers a metadata column numeric if all its non-missing values
+# match this expression
+NUMERIC_VALUE = re.compile(r'^[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?$')
+
+
+def _generate_metadata_file(response, out_fp=None):
     """Method to minimize code duplication: merges the prep/sample info files
 
     Parameters
     ----------
     response : dict
         The response from checking a preparation from Qiita
-    out_fp : str
-        The filepath where we want to store the merged metadata
+    out_fp : str, optional
+        The filepath where we want to store the merged metadata, if it needs
+        to be written
+
+    Returns
+    -------
+    pd.DataFrame
+        The merged metadata
     """
+    import pandas as pd
+
     sf = pd.read_csv(response['sample-file'], sep='\t', dtype='str',
                      na_values=[], keep_default_na=False)
     pf = pd.read_csv(response['prep-file'], sep='\t', dtype='str',
@@ -46,42 +67,281 @@ def _generate_metadata_file(response, out_fp):
     pf.set_index('sample_name', inplace=True)
     # merging sample and info files
     df = pf.join(sf, lsuffix="_prep")
-    df.to_csv(out_fp, sep='\t')
-
-
-def _generate_html_summary(biom_fp, metadata, out_dir, is_analysis, tree=None):
-    if is_analysis:
-        # we need to save and load the df so qiime does it's magic for parsing
-        # columns
-        fd, path = mkstemp()
-        df = pd.DataFrame.from_dict(metadata, orient='index')
-        df.to_csv(path, index_label='#SampleID', na_rep='', sep='\t',
-                  encoding='utf-8')
-        metadata = qiime2.Metadata.load(path)
-        remove(path)
+    if out_fp is not None:
+        df.to_csv(out_fp, sep='\t')
+
+    return df
+
+
+def _metadata_to_qiime2(df):
+    """Builds a qiime2.Metadata inferring the column types as QIIME 2 does
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The metadata, indexed by sample id
+
+    Returns
+    -------
+    qiime2.Metadata
+        The metadata with the numeric columns cast to numbers and the empty
+        values treated as missing
+    """
+    import numpy as np
+    import pandas as pd
+    import qiime2
+
+    # Metadata.load reads all the cells as stripped strings
+    df = df.fillna('').astype(str).apply(lambda col: col.str.strip())
+    df.index = df.index.astype(str).str.strip()
+    df.index.name = 'id'
+    df.columns = [str(c).strip() for c in df.columns]
+    df = df.replace('', np.nan)
+    for col in df.columns:
+        # the columns without any value are numeric, as in QIIME 2. The
+        # values are cast back to str since replace turns these columns into
+        # floats in some pandas versions
+        values = df[col].dropna()
+        if (not len(values) or
+                values.astype(str).str.fullmatch(NUMERIC_VALUE).all()):
+            df[col] = pd.to_numeric(df[col])
+
+    return qiime2.Metadata(df)
+
+
+def _stats_cache_key(ctx):
+    """The cache key of the statistics of a table
+
+    Parameters
+    ----------
+    ctx : qtp_biom.table.TableContext
+        The BIOM table
+
+    Returns
+    -------
+    str or None
+        The key, None if the cache is disabled
+    """
+    if cache.cache_dir() is None:
+        return None
+    return cache.cache_key('table-stats', ctx.content_hash())
+
+
+def _qza_cache_key(ctx):
+    """The cache key of the QIIME 2 artifact of a table
+
+    The qza is written by QIIME 2, so the key depends on its version.
+
+    Parameters
+    ----------
+    ctx : qtp_biom.table.TableContext
+        The BIOM table
+
+    Returns
+    -------
+    str or None
+        The key, None if the cache is disabled
+    """
+    if cache.cache_dir() is None:
+        return None
+    return cache.cache_key('table-qza', ctx.content_hash(), with_qiime2=True)
+
+
+def _summary_cache_key(ctx, metadata, backend):
+    """The cache key of the summary of a table and its metadata
+
+    Parameters
+    ----------
+    ctx : qtp_biom.table.TableContext
+        The BIOM table
+    metadata : qiime2.Metadata or pd.DataFrame
+        The metadata
+    backend : {'qiime2', 'native'}
+        The summary backend
+
+    Returns
+    -------
+    str or None
+        The key, None if the cache is disabled
+    """
+    if cache.cache_dir() is None:
+        return None
+    if hasattr(metadata, 'to_dataframe'):
+        metadata = metadata.to_dataframe()
+    md_hash = sha256(metadata.to_csv().encode('utf-8')).hexdigest()
+    return cache.cache_key(
+        '%s-summary' % backend, '%s-%s' % (ctx.content_hash(), md_hash),
+        with_qiime2=backend == 'qiime2')
+
+
+def _table_phase(ctx, out_dir, need_stats, save_qza, profiler):
+    """Computes the results that only depend on the table
+
+    The results are cached by the contents of the table, so they are reused
+    when only the metadata changes.
+
+    Parameters
+    ----------
+    ctx : qtp_biom.table.TableContext
+        The BIOM table
+    out_dir : str
+        The path to the job's output directory
+    need_stats : bool
+        Whether the statistics of the table are needed
+    save_qza : bool
+        Whether to save the table as a QIIME 2 artifact
+    profiler : qtp_biom.instrument.Profiler
+        The profiler recording the resources used by each stage
+
+    Returns
+    -------
+    dict of {str: np.array} or None, str or None
+        The statistics of the table, if needed
+        The qza filepath, if saved
+    """
+    stats_fp = join(out_dir, TABLE_STATS_FN)
+    table_fp = join(out_dir, QZA_FN)
+
+    # the statistics and the qza are cached separately, so a summary job,
+    # which doesn't need the qza, finds the statistics cached by validate
+    stats = None
+    if need_stats:
+        key = _stats_cache_key(ctx)
+        with profiler.stage('stats_cache_fetch'):
+            hit = key is not None and cache.fetch(
+                key, [TABLE_STATS_FN], out_dir)
+        cached = load_stats(stats_fp) if hit else None
+        if cached is not None:
+            stats = cached[0]
+        else:
+            with profiler.stage('table_stats'):
+                stats = ctx.stats()
+            if key is not None:
+                with profiler.stage('cache_store'):
+                    save_stats(stats_fp, stats, ctx.content_hash())
+                    cache.store(key, [TABLE_STATS_FN], out_dir)
+        if exists(stats_fp):
+            # the statistics are not part of the job results
+            remove(stats_fp)
+
+    if save_qza:
+        key = _qza_cache_key(ctx)
+        with profiler.stage('qza_cache_fetch'):
+            hit = key is not None and cache.fetch(key, [QZA_FN], out_dir)
+        if not hit:
+            with profiler.stage('load_table'):
+                table = ctx.artifact()
+            with profiler.stage('save_qza'):
+                table_fp = table.save(table_fp)
+            if key is not None:
+                with profiler.stage('cache_store'):
+                    cache.store(key, [QZA_FN], out_dir)
+
+    return stats, table_fp if save_qza else None
+
+
+def _generate_html_summary(biom, metadata, out_dir, is_analysis, tree=None,
+                           backend=None, profiler=None, save_qza=True):
+    """Generates the HTML summary and the QIIME 2 artifact of a BIOM table
+
+    Parameters
+    ----------
+    biom : str or qtp_biom.table.TableContext
+        The BIOM filepath or an already loaded table
+    metadata : str, pd.DataFrame or dict
+        The metadata filepath or DataFrame or, for analyses, the metadata
+        dict
+    out_dir : str
+        The path to the job's output directory
+    is_analysis : bool
+        Whether the table belongs to an analysis
+    tree : qtp_biom.tree.TreeStats, optional
+        The statistics of the phylogenetic tree of the table, if it exists
+    backend : {'qiime2', 'native'}, optional
+        The summary backend, defaults to SUMMARY_BACKEND in the configuration
+    profiler : qtp_biom.instrument.Profiler, optional
+        The profiler recording the resources used by each stage
+    save_qza : bool, optional
+        Whether to save the table as a QIIME 2 artifact. Saving it compresses
+        and checksums a full copy of the table, so skip it if the artifact
+        already has a qza
+
+    Returns
+    -------
+    str, str, str or None
+        The index filepath, the support files directory and the qza
+        filepath, None if save_qza is False
+    """
+    # QIIME 2 is only imported by the qiime2 backend, as importing it is
+    # slow
+    import pandas as pd
+
+    ctx = biom if isinstance(biom, TableContext) else TableContext(biom)
+    if profiler is None:
+        profiler = Profiler()
+    if backend is None:
+        backend = get_config().get('summary', 'SUMMARY_BACKEND',
+                                   fallback='qiime2').strip()
+
+    viz_fp = join(out_dir, 'support_files')
+
+    with profiler.stage('load_metadata'):
+        if is_analysis:
+            metadata = pd.DataFrame.from_dict(metadata, orient='index')
+        if backend == 'native':
+            if not isinstance(metadata, pd.DataFrame):
+                metadata = pd.read_csv(metadata, sep='\t', dtype='str',
+                                       index_col=0, na_values=[],
+                                       keep_default_na=False)
+        elif isinstance(metadata, pd.DataFrame):
+            metadata = _metadata_to_qiime2(metadata)
+        else:
+            import qiime2
+            metadata = qiime2.Metadata.load(metadata)
+
+    # the summary depends on the table and the metadata, while the table
+    # statistics and the qza only depend on the table
+    with profiler.stage('cache_fetch'):
+        key = _summary_cache_key(ctx, metadata, backend)
+        hit = key is not None and cache.fetch(key, ['support_files'], out_dir)
+    stats, table_fp = _table_phase(
+        ctx, out_dir, backend == 'native' and not hit, save_qza, profiler)
+
+    if hit:
+        # summarize always names its index index.html
+        index_name = 'index.html'
+    elif backend == 'native':
+        with profiler.stage('native_summary'):
+            index_name = render_summary(stats, viz_fp, metadata)
     else:
-        metadata = qiime2.Metadata.load(metadata)
+        from qiime2.plugins.feature_table.visualizers import summarize
 
-    table = qiime2.Artifact.import_data('FeatureTable[Frequency]', biom_fp)
+        with profiler.stage('load_table'):
+            table = ctx.artifact()
 
-    summary, = summarize(table=table, sample_metadata=metadata)
-    index_paths = summary.get_index_paths()
-    # this block is not really necessary but better safe than sorry
-    if 'html' not in index_paths:
-        return (False, None,
-                "Only Qiime 2 visualization with an html index are supported")
+        with profiler.stage('summarize'):
+            summary, = summarize(table=table, sample_metadata=metadata)
+        index_paths = summary.get_index_paths()
+        # this block is not really necessary but better safe than sorry
+        if 'html' not in index_paths:
+            return (False, None,
+                    "Only Qiime 2 visualization with an html index are "
+                    "supported")
+        index_name = basename(index_paths['html'])
+
+        with profiler.stage('export_data'):
+            export_visualization(summary, viz_fp)
+
+    if not hit and key is not None:
+        with profiler.stage('cache_store'):
+            cache.store(key, ['support_files'], out_dir)
 
     # gather some stats about the phylogenetic tree if exists
     summary_tree = ""
     if tree is not None:
-        num_placements = len([
-            1
-            for tip
-            in tree.tips()
-            if (tip.name is not None) and tip.name[0] in 'ATGC'])
-        num_tips_reference = tree.count(tips=True) - num_placements
-        num_rejected = len(load_table(biom_fp).ids(axis='observation')) - \
-            num_placements
+        num_placements = tree.num_placements
+        num_tips_reference = tree.num_tips - num_placements
+        num_rejected = len(ctx.observation_ids) - num_placements
         summary_tree = (
             "    <table>\n"
             "      <tr>\n"
@@ -99,16 +359,10 @@ def _generate_html_summary(biom_fp, metadata, out_dir, is_analysis, tree=None):
             "    </table>") % (num_placements, num_rejected,
                                num_tips_reference)
 
-    index_name = basename(index_paths['html'])
     index_fp = join(out_dir, 'index.html')
     with open(index_fp, 'w') as f:
         f.write(Q2_INDEX % (summary_tree, index_name))
 
-    viz_fp = join(out_dir, 'support_files')
-    summary.export_data(viz_fp)
-
-    table_fp = table.save(join(out_dir, 'feature-table.qza'))
-
     return (index_fp, viz_fp, table_fp)
 
 
@@ -137,6 +391,7 @@ def generate_html_summary(qclient, job_id, parameters, out_dir):
     # we are going to use the "raw" code for retrieving artifact_info vs. the
     # qiita_client.artifact_and_preparation_files method because this works
     # with biom tables and QIIME 2 artifacts and they _cannot_ be per_sample.
+    profiler = Profiler(qclient, job_id)
     artifact_id = parameters['input_data']
     qclient_url = "/qiita_db/artifacts/%s/" % artifact_id
     artifact_info = qclient.get(qclient_url)
@@ -147,8 +402,7 @@ def generate_html_summary(qclient, job_id, parameters, out_dir):
         qurl = ('/qiita_db/prep_template/%s/' %
                 artifact_info['prep_information'][0])
         response = qclient.get(qurl)
-        md = f'{out_dir}/merged_information_file.txt'
-        _generate_metadata_file(response, md)
+        md = _generate_metadata_file(response)
     else:
         is_analysis = True
         qurl = '/qiita_db/analysis/%s/metadata/' % artifact_info['analysis']
@@ -158,13 +412,25 @@ def generate_html_summary(qclient, job_id, parameters, out_dir):
                               for k, v in artifact_info['files'].items()}
     tree = None
     if 'plain_text' in artifact_info['files']:
-        tree = TreeNode.read(artifact_info['files']['plain_text'][0])
+        with profiler.stage('tree_stats'):
+            tree, tree_hit = cached_tree_stats(
+                artifact_info['files']['plain_text'][0])
+        if tree_hit:
+            qclient.update_job_step(
+                job_id, "Phylogenetic tree statistics retrieved from the "
+                "cache")
 
     # Step 3: generate HTML summary
     # if we get to this point of the code we are sure that this is a biom file
     # and that it only has one element
+    biom_fp = artifact_info['files']['biom'][0]
+    plan = plan_summary(biom_fp, save_qza=False)
+    qclient.update_job_step(
+        job_id, "Generating the %s" % describe_plan(plan))
     index_fp, viz_fp, qza_fp = _generate_html_summary(
-        artifact_info['files']['biom'][0], md, out_dir, is_analysis, tree)
+        biom_fp, md, out_dir, is_analysis, tree, backend=plan.backend,
+        profiler=profiler, save_qza=False)
+    profiler.write(out_dir)
 
     # Step 4: add the new file to the artifact using REST api
     success = True
@@ -0,0 +1,243 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from datetime import datetime
+from fcntl import ioctl
+from shutil import copyfile
+from threading import Lock
+
+import h5py
+import numpy as np
+
+from .cache import file_hash
+from .chunked import chunked_stats, read_ids
+from .fast_summary import table_stats
+from .sidecar import read_sidecar, sidecar_enabled, write_sidecar
+
+
+GENERATED_BY = "Qiita BIOM type plugin"
+
+# ioctl request to share the blocks of a file with a new file (reflink) in
+# the filesystems that support it, e.g. btrfs and xfs
+FICLONE = 0x40049409
+
+
+def _copy_file(src, dst):
+    """Copies src to dst, sharing the blocks when the filesystem allows it
+
+    Parameters
+    ----------
+    src : str
+        The source filepath
+    dst : str
+        The destination filepath
+    """
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        try:
+            ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            return
+        except OSError:
+            pass
+    copyfile(src, dst)
+
+
+class TableContext(object):
+    """Holds a BIOM table so it is only read once per job
+
+    Parameters
+    ----------
+    biom_fp : str
+        The BIOM filepath
+    sidecar : bool, optional
+        Whether to use the statistics sidecar of the table, if enabled in
+        the configuration. Only the tables in the artifact storage should
+        have a sidecar
+
+    Attributes
+    ----------
+    fp : str
+        The filepath that currently holds the table contents
+    """
+    def __init__(self, biom_fp, sidecar=True):
+        self.fp = biom_fp
+        self.sidecar = sidecar
+        self._table = None
+        self._artifact = None
+        self._ids = {}
+        self._hash = None
+        self._lock = Lock()
+        self.is_hdf5 = h5py.is_hdf5(biom_fp)
+
+    @property
+    def table(self):
+        """The parsed biom.Table, loaded on first access
+
+        The validation stages share the context from several threads, so the
+        table is loaded by only one of them.
+        """
+        if self._table is None:
+            with self._lock:
+                if self._table is None:
+                    from biom import load_table
+                    self._table = load_table(self.fp)
+        return self._table
+
+    def ids(self, axis='sample'):
+        """The ids of the table
+
+        Parameters
+        ----------
+        axis : {'sample', 'observation'}, optional
+            The axis to get the ids from
+
+        Returns
+        -------
+        np.array of str
+            The ids of the axis
+        """
+        if axis not in self._ids:
+            if self._table is not None or not self.is_hdf5:
+                self._ids[axis] = self.table.ids(axis=axis)
+            else:
+                self._ids[axis] = read_ids(self.fp, axis)
+        return self._ids[axis]
+
+    @property
+    def sample_ids(self):
+        """The sample ids of the table, as a numpy array"""
+        return self.ids('sample')
+
+    @property
+    def observation_ids(self):
+        """The observation ids of the table, as a numpy array"""
+        return self.ids('observation')
+
+    def _use_sidecar(self):
+        """Whether to read and write the statistics sidecar of the table"""
+        return self.sidecar and sidecar_enabled()
+
+    def content_hash(self):
+        """The sha256 of the contents of the table file
+
+        Returns
+        -------
+        str
+            The hex digest of the file contents
+        """
+        if self._hash is None:
+            cached = read_sidecar(self.fp) if self._use_sidecar() else None
+            self._hash = cached[1] if cached else file_hash(self.fp)
+        return self._hash
+
+    def stats(self):
+        """Computes the per sample and per feature statistics of the table
+
+        If the statistics sidecars are enabled, the statistics are read from
+        the sidecar of the table when it is up to date, and the sidecar is
+        written otherwise. HDF5 tables that are not loaded yet are processed
+        in chunks, so the matrix is never fully in memory.
+
+        Returns
+        -------
+        dict of {str: np.array}
+            The statistics, see qtp_biom.fast_summary.table_stats
+        """
+        use_sidecar = self._use_sidecar()
+        if use_sidecar:
+            cached = read_sidecar(self.fp)
+            if cached is not None:
+                stats, self._hash = cached
+                return stats
+
+        if self._table is None and self.is_hdf5:
+            stats = chunked_stats(self.fp)
+        else:
+            stats = table_stats(self.table)
+
+        if use_sidecar:
+            write_sidecar(self.fp, stats, self.content_hash())
+        return stats
+
+    def artifact(self):
+        """Builds the QIIME 2 FeatureTable[Frequency] of the table
+
+        The artifact is built from the loaded table or, if the table is not
+        loaded, directly from the HDF5 file.
+
+        Returns
+        -------
+        qiime2.Artifact
+            The feature table artifact
+        """
+        if self._artifact is None:
+            import qiime2
+            if self._table is None and self.is_hdf5:
+                source = self.fp
+            else:
+                source = self.table
+            self._artifact = qiime2.Artifact.import_data(
+                'FeatureTable[Frequency]', source)
+        return self._artifact
+
+    def update_sample_ids(self, new_ids, out_fp):
+        """Writes the table to out_fp with the sample ids renamed
+
+        For HDF5 tables only the sample ids dataset of a copy of the file is
+        rewritten, so the matrix is never decoded nor encoded again.
+
+        Parameters
+        ----------
+        new_ids : np.array of str
+            The new sample ids, in the same order as the current sample ids
+        out_fp : str
+            The filepath where the updated table is written
+
+        Raises
+        ------
+        TableException
+            If the number of new ids doesn't match the number of samples or
+            if the new ids are duplicated
+        """
+        from biom.exception import TableException
+        from biom.util import biom_open
+
+        ids = self.sample_ids
+        new_ids = np.asarray(new_ids, dtype=str)
+        if len(new_ids) != len(ids):
+            raise TableException(
+                "Expected %d sample ids, got %d" % (len(ids), len(new_ids)))
+        if len(np.unique(new_ids)) != len(new_ids):
+            raise TableException("Duplicate IDs observed")
+        id_map = dict(zip(ids.tolist(), new_ids.tolist()))
+
+        if self.is_hdf5:
+            _copy_file(self.fp, out_fp)
+            with h5py.File(out_fp, 'r+') as f:
+                grp = f['sample']
+                compression = grp['ids'].compression
+                del grp['ids']
+                grp.create_dataset(
+                    'ids', shape=(len(new_ids),),
+                    dtype=h5py.special_dtype(vlen=str),
+                    data=[i.encode('utf8') for i in new_ids.tolist()],
+                    compression=compression)
+                f.attrs['generated-by'] = GENERATED_BY
+                f.attrs['creation-date'] = datetime.now().isoformat()
+            if self._table is not None:
+                self._table.update_ids(id_map, axis='sample')
+        else:
+            # JSON and TSV tables are converted to HDF5
+            self.table.update_ids(id_map, axis='sample')
+            with biom_open(out_fp, 'w') as f:
+                self.table.to_hdf5(f, GENERATED_BY)
+
+        self.fp = out_fp
+        self.is_hdf5 = True
+        self._ids['sample'] = new_ids
+        self._hash = None
+        self._artifact = None
@@ -5,3 +5,56 @@
 #
 # The full license is in the file LICENSE, distributed with this software.
 # -----------------------------------------------------------------------------
+
+from contextlib import contextmanager
+from os import environ
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest.mock import patch
+
+from qtp_biom.util import get_config
+
+
+@contextmanager
+def plugin_config(contents=None):
+    """Overrides the plugin configuration within a block
+
+    Parameters
+    ----------
+    contents : str, optional
+        The contents of the configuration file overriding the default one.
+        If None, only the default configuration is used
+    """
+    tmp_dir = mkdtemp()
+    try:
+        with patch.dict(environ):
+            if contents is None:
+                environ.pop('QTP_BIOM_CONFIG_FP', None)
+            else:
+                config_fp = join(tmp_dir, 'config.cfg')
+                with open(config_fp, 'w') as f:
+                    f.write(contents)
+                environ['QTP_BIOM_CONFIG_FP'] = config_fp
+            get_config.cache_clear()
+            try:
+                yield
+            finally:
+                get_config.cache_clear()
+    finally:
+        rmtree(tmp_dir)
+
+
+def set_plugin_config(test, contents=None):
+    """Overrides the plugin configuration until the end of a test
+
+    Parameters
+    ----------
+    test : unittest.TestCase
+        The running test
+    contents : str, optional
+        The contents of the configuration file, see plugin_config
+    """
+    config = plugin_config(contents)
+    config.__enter__()
+    test.addCleanup(config.__exit__, None, None, None)
@@ -0,0 +1,163 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from unittest import main, TestCase
+from tempfile import mkdtemp
+from os.path import isdir, join
+from shutil import rmtree
+from collections import Counter
+from json import dumps
+
+import numpy as np
+from biom import Table
+from biom.util import biom_open
+
+from qtp_biom.batch import run_batch, validate_batch
+from qtp_biom.remap import UNKNOWN_SAMPLES_ERROR
+from qtp_biom.tests import set_plugin_config
+
+
+class FakeClient(object):
+    def __init__(self, sample_fp, prep_fp, jobs=None):
+        self.requests = Counter()
+        self.files = {'sample-file': sample_fp, 'prep-file': prep_fp}
+        self.jobs = jobs or {}
+        self.running = set()
+        self.completed = {}
+
+    def get(self, url):
+        self.requests[url] += 1
+        if url == '/qiita_db/prep_template/1/data/':
+            return {'data': {'1.S1': {'col': 'val'}}}
+        if url == '/qiita_db/prep_template/1/':
+            return self.files
+        if url == '/qiita_db/analysis/1/metadata/':
+            return {'1.S1': {'col': 'val'}, '1.S2': {'col': 'val'}}
+        raise RuntimeError('Unknown url %s' % url)
+
+    def get_job_info(self, job_id):
+        if job_id not in self.jobs:
+            raise RuntimeError('Unknown job %s' % job_id)
+        return self.jobs[job_id]
+
+    def start_heartbeat(self, job_id):
+        self.running.add(job_id)
+
+    def update_job_step(self, job_id, step):
+        pass
+
+    def complete_job(self, job_id, success, error_msg=None,
+                     artifacts_info=None):
+        # as Qiita, only the running jobs can be completed
+        if job_id not in self.running:
+            raise RuntimeError('Job %s is not running' % job_id)
+        self.completed[job_id] = (success, artifacts_info, error_msg)
+
+
+class BatchTests(TestCase):
+    def setUp(self):
+        self.out_dir = mkdtemp()
+        sample_fp = join(self.out_dir, 'sample.txt')
+        prep_fp = join(self.out_dir, 'prep.txt')
+        with open(sample_fp, 'w') as f:
+            f.write('sample_name\tenv\n1.S1\tsoil\n')
+        with open(prep_fp, 'w') as f:
+            f.write('sample_name\tcol\n1.S1\tval\n')
+        self.qclient = FakeClient(sample_fp, prep_fp)
+
+    def tearDown(self):
+        rmtree(self.out_dir)
+
+    def _params(self, **kwargs):
+        params = {'files': dumps({'biom': ['ignored']}),
+                  'artifact_type': 'UNKNOWN'}
+        params.update(kwargs)
+        return params
+
+    def test_validate_batch(self):
+        jobs = [('job-1', self._params(template=1)),
+                ('job-2', self._params(template=1)),
+                ('job-3', self._params(template=2)),
+                ('job-4', self._params())]
+        obs = validate_batch(self.qclient, jobs, self.out_dir, workers=4)
+
+        # the metadata of each preparation is only retrieved once
+        self.assertEqual(
+            self.qclient.requests['/qiita_db/prep_template/1/data/'], 1)
+        self.assertEqual(
+            self.qclient.requests['/qiita_db/prep_template/1/'], 1)
+
+        exp_unknown = (False, None,
+                       'Unknown artifact type UNKNOWN. Supported types: BIOM')
+        self.assertEqual(obs[0], exp_unknown)
+        self.assertEqual(obs[1], exp_unknown)
+        self.assertEqual(
+            obs[2],
+            (False, None, 'Unknown url /qiita_db/prep_template/2/data/'))
+        self.assertEqual(obs[3], exp_unknown)
+
+
+class RunBatchTests(TestCase):
+    def setUp(self):
+        self.out_dir = mkdtemp()
+        set_plugin_config(self, '[summary]\nSUMMARY_BACKEND = native\n')
+
+    def tearDown(self):
+        rmtree(self.out_dir)
+
+    def _table(self, name, sample_ids):
+        fp = join(self.out_dir, name)
+        table = Table(np.array([[0, 1], [2, 3]]), ['O1', 'O2'], sample_ids)
+        with biom_open(fp, 'w') as f:
+            table.to_hdf5(f, "Test")
+        return fp
+
+    def _job(self, biom_fp, command='Validate'):
+        return {'command': command,
+                'parameters': {'analysis': 1, 'artifact_type': 'BIOM',
+                               'files': dumps({'biom': [biom_fp]})}}
+
+    def test_run_batch(self):
+        valid_fp = self._table('valid.biom', ['1.S1', '1.S2'])
+        unknown_fp = self._table('unknown.biom', ['1.S1', '1.S3'])
+        jobs = {'job-1': self._job(valid_fp),
+                'job-2': self._job(unknown_fp),
+                'job-3': self._job(valid_fp, 'Generate HTML summary'),
+                'job-4': self._job(valid_fp)}
+        qclient = FakeClient(None, None, jobs)
+        job_ids = ['job-5', 'job-1', 'job-2', 'job-3', 'job-4']
+        obs, obs_failed = run_batch(
+            qclient, job_ids, join(self.out_dir, 'out'), workers=2)
+
+        # the unknown job can't be completed, but every other job is
+        # completed with its own result
+        self.assertEqual(obs[0], (False, None, 'Unknown job job-5'))
+        self.assertEqual(obs_failed, {'job-5': 'Job job-5 is not running'})
+        self.assertEqual(obs[1:], [qclient.completed[j] for j in job_ids[1:]])
+        # the metadata of the analysis is only retrieved once
+        self.assertEqual(
+            qclient.requests['/qiita_db/analysis/1/metadata/'], 1)
+
+        for job_id in ('job-1', 'job-4'):
+            success, artifacts_info, error_msg = qclient.completed[job_id]
+            self.assertTrue(success)
+            self.assertEqual(error_msg, '')
+            self.assertEqual(artifacts_info[0].artifact_type, 'BIOM')
+            self.assertIn((valid_fp, 'biom'), artifacts_info[0].files)
+            self.assertTrue(isdir(join(self.out_dir, 'out', job_id)))
+
+        self.assertEqual(qclient.completed['job-2'],
+                         (False, None, UNKNOWN_SAMPLES_ERROR))
+        self.assertEqual(
+            qclient.completed['job-3'],
+            (False, None, 'Job job-3 is not a Validate job: Generate HTML '
+                          'summary'))
+
+
+if __name__ == '__main__':
+    main()
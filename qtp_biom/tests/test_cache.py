@@ -0,0 +1,139 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from unittest import main, TestCase
+from tempfile import mkdtemp
+from os import listdir, mkdir, remove, stat
+from os.path import exists, join
+from shutil import rmtree
+from unittest.mock import patch
+
+from qtp_biom import cache
+from qtp_biom.tests import plugin_config, set_plugin_config
+
+
+class CacheTests(TestCase):
+    def setUp(self):
+        self.base_dir = mkdtemp()
+        self.cache_dir = join(self.base_dir, 'cache')
+        set_plugin_config(self, self._config(50))
+
+        self.src_dir = join(self.base_dir, 'src')
+        mkdir(self.src_dir)
+        mkdir(join(self.src_dir, 'support_files'))
+        with open(join(self.src_dir, 'support_files', 'index.html'), 'w') as f:
+            f.write('<html></html>')
+        with open(join(self.src_dir, 'feature-table.qza'), 'w') as f:
+            f.write('qza')
+
+    def tearDown(self):
+        rmtree(self.base_dir)
+
+    def _config(self, max_size):
+        return ('[cache]\nCACHE_DIR = %s\nCACHE_MAX_SIZE = %s\n'
+                % (self.cache_dir, max_size))
+
+    def test_cache_disabled(self):
+        with plugin_config():
+            self.assertIsNone(cache.cache_dir())
+            cache.store('key', ['feature-table.qza'], self.src_dir)
+            self.assertFalse(exists(self.cache_dir))
+            self.assertFalse(
+                cache.fetch('key', ['feature-table.qza'], self.base_dir))
+
+    def test_store_fetch(self):
+        names = ['support_files', 'feature-table.qza']
+        out_dir = join(self.base_dir, 'out')
+        mkdir(out_dir)
+        self.assertFalse(cache.fetch('key', names, out_dir))
+
+        cache.store('key', names, self.src_dir)
+        self.assertTrue(cache.fetch('key', names, out_dir))
+        obs_fp = join(out_dir, 'support_files', 'index.html')
+        with open(obs_fp) as f:
+            self.assertEqual(f.read(), '<html></html>')
+        # the files are hard linked, not copied
+        self.assertEqual(
+            stat(obs_fp).st_ino,
+            stat(join(self.src_dir, 'support_files', 'index.html')).st_ino)
+        # only complete entries are retrieved
+        self.assertFalse(cache.fetch('key', names + ['other'], out_dir))
+
+    def test_store_existing(self):
+        cache.store('key', ['support_files'], self.src_dir)
+        entry = join(self.cache_dir, 'key')
+        index_fp = join(entry, 'support_files', 'index.html')
+        ino = stat(index_fp).st_ino
+
+        # the existing files are kept and the missing ones are added
+        src_dir = join(self.base_dir, 'src2')
+        mkdir(src_dir)
+        mkdir(join(src_dir, 'support_files'))
+        with open(join(src_dir, 'support_files', 'index.html'), 'w') as f:
+            f.write('<html>new</html>')
+        with open(join(src_dir, 'feature-table.qza'), 'w') as f:
+            f.write('qza')
+        cache.store('key', ['support_files', 'feature-table.qza'], src_dir)
+        self.assertEqual(stat(index_fp).st_ino, ino)
+        self.assertTrue(exists(join(entry, 'feature-table.qza')))
+        self.assertEqual(
+            [e for e in listdir(self.cache_dir) if e.startswith('.tmp-')],
+            [])
+
+    def test_fetch_removed_concurrently(self):
+        names = ['support_files', 'feature-table.qza']
+        cache.store('key', names, self.src_dir)
+        entry = join(self.cache_dir, 'key')
+        out_dir = join(self.base_dir, 'out')
+        mkdir(out_dir)
+
+        # a directory emptied by another job is not fetched empty
+        rmtree(join(entry, 'support_files'))
+        mkdir(join(entry, 'support_files'))
+        self.assertFalse(cache.fetch('key', names, out_dir))
+        self.assertEqual(listdir(out_dir), [])
+
+        # nor a removed file raises
+        cache.store('other', names, self.src_dir)
+        remove(join(self.cache_dir, 'other', 'feature-table.qza'))
+        self.assertFalse(cache.fetch('other', names, out_dir))
+        self.assertEqual(listdir(out_dir), [])
+
+    def test_evict_sizes(self):
+        names = ['support_files', 'feature-table.qza']
+        cache.store('key', names, self.src_dir)
+        # the eviction reads the stored sizes instead of walking the entries
+        with plugin_config(self._config(0)), \
+                patch.object(cache, 'walk', side_effect=AssertionError):
+            cache.evict()
+        self.assertEqual(listdir(self.cache_dir), [])
+
+    def test_evict(self):
+        names = ['feature-table.qza']
+        cache.store('key1', names, self.src_dir)
+        with plugin_config(self._config(0)):
+            cache.store('key2', names, self.src_dir)
+        self.assertFalse(exists(join(self.cache_dir, 'key1')))
+
+    def test_cache_key(self):
+        key = cache.cache_key('table', 'abc')
+        self.assertTrue(key.startswith('table-'))
+        self.assertTrue(key.endswith('-abc'))
+        # the results of another version of the plugin are not reused
+        with patch.object(cache, 'PLUGIN_VERSION', '0.0.0'):
+            self.assertNotEqual(cache.cache_key('table', 'abc'), key)
+
+    def test_file_hash(self):
+        fp = join(self.src_dir, 'feature-table.qza')
+        self.assertEqual(
+            cache.file_hash(fp),
+            '49f72a011961cd8edf0279e4355d282e2ad8253ff7c449275d2e9c15a8ae5485')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from unittest import main, TestCase
+from tempfile import mkstemp
+from os import close, remove
+
+import numpy as np
+import numpy.testing as npt
+from biom import Table
+from biom.util import biom_open
+
+from qtp_biom.chunked import iter_blocks, chunked_stats, read_ids
+from qtp_biom.fast_summary import table_stats
+
+
+class ChunkedTests(TestCase):
+    def setUp(self):
+        fd, self.biom_fp = mkstemp(suffix=".biom")
+        close(fd)
+        np.random.seed(0)
+        data = np.random.randint(3, size=(20, 7)) * \
+            np.random.randint(100, size=(20, 7))
+        self.table = Table(data, ['O%d' % i for i in range(20)],
+                           ['S%d' % i for i in range(7)])
+        with biom_open(self.biom_fp, 'w') as f:
+            self.table.to_hdf5(f, "Test")
+
+    def tearDown(self):
+        remove(self.biom_fp)
+
+    def test_read_ids(self):
+        self.assertEqual(read_ids(self.biom_fp, 'sample').tolist(),
+                         ['S%d' % i for i in range(7)])
+
+    def test_iter_blocks(self):
+        nnz = self.table.nnz
+        blocks = list(iter_blocks(self.biom_fp, 'observation', 5))
+        self.assertTrue(len(blocks) > 1)
+        self.assertEqual(sum(len(data) for _, _, _, data in blocks), nnz)
+        for start, indptr, indices, data in blocks:
+            self.assertEqual(indptr[0], 0)
+            self.assertEqual(indptr[-1], len(data))
+            # blocks only exceed the size if they hold a single row
+            self.assertTrue(len(data) <= 5 or len(indptr) == 2)
+        starts = [start for start, _, _, _ in blocks]
+        self.assertEqual(starts[0], 0)
+        self.assertEqual(sorted(starts), starts)
+
+    def test_chunked_stats(self):
+        exp = table_stats(self.table)
+        for size in (1, 5, 1000):
+            obs = chunked_stats(self.biom_fp, size)
+            for key in exp:
+                npt.assert_array_equal(obs[key], exp[key])
+
+
+if __name__ == '__main__':
+    main()
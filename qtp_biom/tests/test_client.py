@@ -0,0 +1,100 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from unittest import main, TestCase
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from threading import Thread
+from urllib.request import urlopen, Request
+from json import dumps, loads
+from time import sleep, perf_counter
+
+from qtp_biom.client import get_concurrently, AsyncStepsClient
+
+
+# Latency, in seconds, of each request to the stub server
+LATENCY = 0.2
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def _reply(self):
+        sleep(LATENCY)
+        self.server.received.append((self.command, self.path))
+        body = dumps({'path': self.path}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _reply
+    do_POST = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+class StubClient(object):
+    """Minimal client with the QiitaClient methods used by the plugin"""
+    def __init__(self, url):
+        self.url = url
+
+    def get(self, path):
+        with urlopen(self.url + path) as r:
+            return loads(r.read())
+
+    def update_job_step(self, job_id, step):
+        req = Request(self.url + '/job/%s/step/' % job_id, data=step.encode(),
+                      method='POST')
+        with urlopen(req) as r:
+            return loads(r.read())
+
+
+class ClientTests(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        self.server.received = []
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        self.qclient = StubClient(
+            'http://127.0.0.1:%d' % self.server.server_address[1])
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_get_concurrently(self):
+        urls = ['/qiita_db/prep_template/%d/' % i for i in range(4)]
+
+        start = perf_counter()
+        exp = [self.qclient.get(url) for url in urls]
+        sequential = perf_counter() - start
+
+        start = perf_counter()
+        obs = get_concurrently(self.qclient, urls)
+        concurrent = perf_counter() - start
+
+        self.assertEqual(obs, exp)
+        self.assertGreaterEqual(sequential, len(urls) * LATENCY)
+        self.assertLess(concurrent, sequential / 2)
+
+    def test_async_steps_client(self):
+        start = perf_counter()
+        with AsyncStepsClient(self.qclient) as client:
+            client.update_job_step('job-1', 'Step 1')
+            client.update_job_step('job-1', 'Step 2')
+            # the updates don't block the job
+            self.assertLess(perf_counter() - start, LATENCY)
+            # other calls are forwarded to the wrapped client
+            self.assertEqual(client.get('/other/'), {'path': '/other/'})
+        # all the updates are sent when the client is closed
+        self.assertEqual(
+            [path for method, path in self.server.received
+             if method == 'POST'], ['/job/job-1/step/'] * 2)
+
+
+if __name__ == '__main__':
+    main()
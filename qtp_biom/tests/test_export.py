@@ -0,0 +1,53 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from unittest import main, TestCase
+from os import makedirs
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from qtp_biom.export import export_visualization
+
+
+class FakeVisualization(object):
+    """Writes a few files in nested directories, like QIIME 2 does"""
+    def export_data(self, out_dir):
+        makedirs(join(out_dir, 'js', 'lib'))
+        for name in ('index.html', join('js', 'a.js'),
+                     join('js', 'lib', 'b.js')):
+            with open(join(out_dir, name), 'w') as f:
+                f.write(name)
+
+
+class ExportVisualizationTests(TestCase):
+    def setUp(self):
+        self.out_dir = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.out_dir)
+
+    def _check(self, viz_fp):
+        for name in ('index.html', join('js', 'a.js'),
+                     join('js', 'lib', 'b.js')):
+            with open(join(viz_fp, name)) as f:
+                self.assertEqual(f.read(), name)
+
+    def test_export_visualization(self):
+        viz_fp = join(self.out_dir, 'support_files')
+        export_visualization(FakeVisualization(), viz_fp, threads=0)
+        self._check(viz_fp)
+
+    def test_export_visualization_threads(self):
+        viz_fp = join(self.out_dir, 'support_files')
+        export_visualization(FakeVisualization(), viz_fp, threads=4)
+        self._check(viz_fp)
+
+
+if __name__ == '__main__':
+    main()
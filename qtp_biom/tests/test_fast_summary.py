@@ -0,0 +1,67 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from unittest import main, TestCase
+from tempfile import mkdtemp
+from os.path import join
+from shutil import rmtree
+
+import numpy as np
+import numpy.testing as npt
+import pandas as pd
+from biom import Table
+
+from qtp_biom.fast_summary import table_stats, render_summary
+
+
+class FastSummaryTests(TestCase):
+    def setUp(self):
+        self.out_dir = mkdtemp()
+        data = np.array([[0, 1, 2], [3, 0, 0]])
+        self.table = Table(data, ['O1', 'O2'], ['S1', 'S2', 'S3'])
+
+    def tearDown(self):
+        rmtree(self.out_dir)
+
+    def test_table_stats(self):
+        obs = table_stats(self.table)
+        self.assertEqual(obs['sample_ids'].tolist(), ['S1', 'S2', 'S3'])
+        self.assertEqual(obs['feature_ids'].tolist(), ['O1', 'O2'])
+        npt.assert_array_equal(obs['sample_totals'], [3, 1, 2])
+        npt.assert_array_equal(obs['feature_totals'], [3, 3])
+        npt.assert_array_equal(obs['sample_nnz'], [1, 1, 1])
+        npt.assert_array_equal(obs['feature_nnz'], [2, 1])
+
+    def test_render_summary(self):
+        viz_fp = join(self.out_dir, 'support_files')
+        obs = render_summary(table_stats(self.table), viz_fp)
+        self.assertEqual(obs, 'index.html')
+        with open(join(viz_fp, 'index.html')) as f:
+            obs_html = f.read()
+        self.assertIn('<th>Number of samples</th><td>3</td>', obs_html)
+        self.assertIn('<th>Sparsity</th><td>0.5000</td>', obs_html)
+        with open(join(viz_fp, 'sample-frequency-detail.csv')) as f:
+            self.assertEqual(f.read().splitlines(),
+                             [',frequency', 'S1,3.0', 'S3,2.0', 'S2,1.0'])
+
+    def test_render_summary_metadata(self):
+        viz_fp = join(self.out_dir, 'support_files')
+        metadata = pd.DataFrame({'site': ['gut', 'skin', 'oral']},
+                                index=['S3', 'S1', 'S4'])
+        render_summary(table_stats(self.table), viz_fp, metadata)
+        with open(join(viz_fp, 'index.html')) as f:
+            self.assertIn('<th>Samples with metadata</th><td>2</td>',
+                          f.read())
+        with open(join(viz_fp, 'sample-frequency-detail.csv')) as f:
+            self.assertEqual(
+                f.read().splitlines(),
+                [',frequency,site', 'S1,3.0,skin', 'S3,2.0,gut', 'S2,1.0,'])
+
+
+if __name__ == '__main__':
+    main()
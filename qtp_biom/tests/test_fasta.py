@@ -0,0 +1,74 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from unittest import main, TestCase
+from gzip import open as gzip_open
+from os.path import exists, join
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from qtp_biom import fasta
+from qtp_biom.fasta import fasta_ids, INDEX_SUFFIX
+
+FASTA = '>O1 some description\nACGT\nACGT\n>O2\nACGT\n> O3\tdesc\n\n>O4'
+
+
+class FastaIdsTests(TestCase):
+    def setUp(self):
+        self.out_dir = mkdtemp()
+        self.fasta_fp = join(self.out_dir, 'seqs.fna')
+        with open(self.fasta_fp, 'w') as f:
+            f.write(FASTA)
+
+    def tearDown(self):
+        rmtree(self.out_dir)
+
+    def test_fasta_ids(self):
+        obs = fasta_ids(self.fasta_fp, use_index=False)
+        self.assertEqual(obs, ['O1', 'O2', 'O3', 'O4'])
+        self.assertFalse(exists(self.fasta_fp + INDEX_SUFFIX))
+
+    def test_fasta_ids_empty(self):
+        with open(self.fasta_fp, 'w'):
+            pass
+        self.assertEqual(fasta_ids(self.fasta_fp, use_index=False), [])
+
+    def test_fasta_ids_gzip(self):
+        gz_fp = join(self.out_dir, 'seqs.fna.gz')
+        with gzip_open(gz_fp, 'wt') as f:
+            f.write(FASTA)
+        # small blocks so headers are split between blocks
+        old = fasta.BLOCK_SIZE
+        fasta.BLOCK_SIZE = 3
+        try:
+            obs = fasta_ids(gz_fp, use_index=False)
+        finally:
+            fasta.BLOCK_SIZE = old
+        self.assertEqual(obs, ['O1', 'O2', 'O3', 'O4'])
+
+    def test_fasta_ids_index(self):
+        obs = fasta_ids(self.fasta_fp, use_index=True)
+        self.assertEqual(obs, ['O1', 'O2', 'O3', 'O4'])
+        self.assertTrue(exists(self.fasta_fp + INDEX_SUFFIX))
+
+        # the index is used while the file doesn't change
+        with open(self.fasta_fp + INDEX_SUFFIX) as f:
+            contents = f.read()
+        with open(self.fasta_fp + INDEX_SUFFIX, 'w') as f:
+            f.write(contents.replace('O4', 'Indexed'))
+        obs = fasta_ids(self.fasta_fp, use_index=True)
+        self.assertEqual(obs, ['O1', 'O2', 'O3', 'Indexed'])
+
+        # and it is rebuilt when the file changes
+        with open(self.fasta_fp, 'w') as f:
+            f.write('>New\nACGT\n')
+        self.assertEqual(fasta_ids(self.fasta_fp, use_index=True), ['New'])
+
+
+if __name__ == '__main__':
+    main()
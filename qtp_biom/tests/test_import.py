@@ -0,0 +1,49 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from unittest import main, TestCase
+from subprocess import check_output
+from json import loads
+import sys
+
+
+# Maximum time, in seconds, that importing the plugin can take
+IMPORT_TIME_BUDGET = 1.0
+
+IMPORT_SCRIPT = """
+import json
+import sys
+from time import perf_counter
+
+start = perf_counter()
+import qtp_biom
+elapsed = perf_counter() - start
+
+heavy = ['qiime2', 'skbio', 'pandas', 'biom', 'bp', 'qiita_files']
+print(json.dumps({'time': elapsed,
+                  'loaded': [m for m in heavy if m in sys.modules]}))
+"""
+
+
+class ImportTests(TestCase):
+    def _import_plugin(self):
+        return loads(check_output([sys.executable, '-c', IMPORT_SCRIPT]))
+
+    def test_import_is_lazy(self):
+        obs = self._import_plugin()
+        self.assertEqual(obs['loaded'], [])
+
+    def test_import_time(self):
+        # take the best of a few runs so a busy machine does not make the
+        # test flaky
+        obs = min(self._import_plugin()['time'] for i in range(3))
+        self.assertLess(obs, IMPORT_TIME_BUDGET)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from unittest import main, TestCase
+from unittest.mock import patch, MagicMock
+from json import load
+from os import environ
+from os.path import exists, join
+from shutil import rmtree
+from tempfile import mkdtemp
+from time import sleep
+
+from qtp_biom.instrument import Profiler, PROFILE_FN, measured
+
+
+class ProfilerTests(TestCase):
+    def setUp(self):
+        self.out_dir = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.out_dir)
+
+    def _profiler(self, mode, qclient=None):
+        with patch.dict(environ, {'QTP_BIOM_PROFILE': mode}):
+            return Profiler(qclient, 'job-id')
+
+    def test_disabled(self):
+        with patch.dict(environ):
+            environ.pop('QTP_BIOM_PROFILE', None)
+            profiler = Profiler()
+        self.assertFalse(profiler.enabled)
+        with profiler.stage('stage'):
+            pass
+        self.assertEqual(profiler.records, [])
+        self.assertIsNone(profiler.write(self.out_dir))
+        self.assertFalse(exists(join(self.out_dir, PROFILE_FN)))
+        self.assertFalse(self._profiler('0').enabled)
+
+    def test_stage(self):
+        profiler = self._profiler('1')
+        with profiler.stage('sleep'):
+            sleep(0.1)
+        with self.assertRaises(ValueError):
+            with profiler.stage('error'):
+                raise ValueError('boom')
+        self.assertEqual([r['stage'] for r in profiler.records],
+                         ['sleep', 'error'])
+        obs = profiler.records[0]
+        self.assertGreaterEqual(obs['wall_time'], 0.1)
+        self.assertLess(obs['cpu_time'], obs['wall_time'])
+        self.assertGreater(obs['peak_rss_mb'], 0)
+
+        fp = profiler.write(self.out_dir)
+        self.assertEqual(fp, join(self.out_dir, PROFILE_FN))
+        with open(fp) as f:
+            obs = load(f)
+        self.assertEqual(obs['job_id'], 'job-id')
+        self.assertEqual(obs['stages'], profiler.records)
+
+    def test_report_steps(self):
+        qclient = MagicMock()
+        profiler = self._profiler('1', qclient)
+        with profiler.stage('stage'):
+            pass
+        qclient.update_job_step.assert_not_called()
+
+        profiler = self._profiler('steps', qclient)
+        with profiler.stage('stage'):
+            pass
+        job_id, step = qclient.update_job_step.call_args[0]
+        self.assertEqual(job_id, 'job-id')
+        self.assertTrue(step.startswith('Profile: stage took '))
+
+    def test_measured(self):
+        obs, (wall, cpu, rss) = measured(sum, ([1, 2, 3], ))
+        self.assertEqual(obs, 6)
+        self.assertGreaterEqual(wall, 0)
+        self.assertGreaterEqual(cpu, 0)
+        self.assertGreater(rss, 0)
+
+
+if __name__ == '__main__':
+    main()
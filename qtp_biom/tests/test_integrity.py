@@ -0,0 +1,91 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from unittest import main, TestCase
+from tempfile import mkdtemp
+from os.path import join
+from shutil import rmtree
+
+import h5py
+import numpy as np
+from biom import Table
+from biom.util import biom_open
+
+from qtp_biom.integrity import check_biom
+
+
+class CheckBiomTests(TestCase):
+    def setUp(self):
+        self.out_dir = mkdtemp()
+        self.biom_fp = join(self.out_dir, 'table.biom')
+        data = np.array([[0, 1, 2], [3, 0, 4]])
+        table = Table(data, ['O1', 'O2'], ['S1', 'S2', 'S3'])
+        with biom_open(self.biom_fp, 'w') as f:
+            table.to_hdf5(f, "Test")
+
+    def tearDown(self):
+        rmtree(self.out_dir)
+
+    def _replace(self, path, values):
+        with h5py.File(self.biom_fp, 'r+') as f:
+            dtype = f[path].dtype
+            del f[path]
+            f.create_dataset(path, data=np.asarray(values, dtype=dtype))
+
+    def _check(self, exp):
+        obs = check_biom(self.biom_fp, size=2)
+        self.assertTrue(obs.startswith('The BIOM table is corrupt'), obs)
+        self.assertIn(exp, obs)
+
+    def test_check_biom(self):
+        self.assertEqual(check_biom(self.biom_fp, size=2), '')
+
+    def test_check_biom_not_hdf5(self):
+        json_fp = join(self.out_dir, 'table.json')
+        with open(json_fp, 'w') as f:
+            f.write('{}')
+        self.assertEqual(check_biom(json_fp), '')
+
+    def test_check_biom_duplicated_ids(self):
+        self._replace('sample/ids', [b'S1', b'S2', b'S1'])
+        self._check('duplicated sample ids: S1')
+
+    def test_check_biom_shape(self):
+        with h5py.File(self.biom_fp, 'r+') as f:
+            f.attrs['shape'] = (2, 4)
+        self._check('the shape (2, 4) does not match')
+
+    def test_check_biom_indptr(self):
+        self._replace('observation/matrix/indptr', [0, 3, 2])
+        self._check('observation matrix index pointers are not increasing')
+        self._replace('observation/matrix/indptr', [0, 2])
+        self._check('observation matrix has 2 index pointers for 2')
+
+    def test_check_biom_indices(self):
+        self._replace('sample/matrix/indices', [1, 0, 2, 1])
+        self._check('sample matrix has indices out of the range of the 2 '
+                    'observation ids')
+
+    def test_check_biom_data(self):
+        self._replace('observation/matrix/data', [1, 2, np.nan, 4])
+        self._check('observation matrix has NaN or infinite counts')
+        self._replace('observation/matrix/data', [1, 2, -3, 4])
+        self._check('observation matrix has negative counts')
+
+    def test_check_biom_matrices_differ(self):
+        self._replace('observation/matrix/data', [1, 2, 3, 5])
+        self._check('the observation and sample matrices hold different')
+
+    def test_check_biom_missing_dataset(self):
+        with h5py.File(self.biom_fp, 'r+') as f:
+            del f['sample/matrix/indices']
+        self._check('unable to read the file')
+
+
+if __name__ == '__main__':
+    main()
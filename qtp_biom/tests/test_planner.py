@@ -0,0 +1,87 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from unittest import main, TestCase
+from tempfile import mkdtemp
+from os.path import join
+from shutil import rmtree
+
+import h5py
+import numpy as np
+from biom import Table
+from biom.util import biom_open
+
+from qtp_biom.planner import (
+    plan_summary, estimate_memory, table_size, describe_plan, Plan)
+
+
+class PlannerTests(TestCase):
+    def setUp(self):
+        self.out_dir = mkdtemp()
+        self.biom_fp = join(self.out_dir, 'table.biom')
+        data = np.array([[0, 1, 2], [3, 0, 4]])
+        table = Table(data, ['O1', 'O2'], ['S1', 'S2', 'S3'])
+        with biom_open(self.biom_fp, 'w') as f:
+            table.to_hdf5(f, "Test")
+
+    def tearDown(self):
+        rmtree(self.out_dir)
+
+    def test_table_size(self):
+        self.assertEqual(table_size(self.biom_fp), (2, 3, 4))
+
+    def test_table_size_missing_attrs(self):
+        with h5py.File(self.biom_fp, 'a') as f:
+            del f.attrs['shape']
+            del f.attrs['nnz']
+        self.assertEqual(table_size(self.biom_fp), (2, 3, 4))
+
+    def test_estimate_memory(self):
+        obs = estimate_memory(self.biom_fp)
+        self.assertGreater(obs['in-memory'], obs['qza'])
+        self.assertGreater(obs['qza'], 0)
+        self.assertGreater(obs['chunked'], 0)
+
+    def test_plan_summary(self):
+        est = estimate_memory(self.biom_fp)
+        # unlimited budget, the table is not even read
+        missing_fp = join(self.out_dir, 'missing.biom')
+        obs = plan_summary(missing_fp, 'qiime2', True, 0)
+        self.assertEqual(obs, Plan('in-memory', 'qiime2', True, None))
+        obs = plan_summary(missing_fp, 'native', False, 0)
+        self.assertEqual(obs, Plan('chunked', 'native', False, None))
+        # the table doesn't fit in memory for summarize
+        obs = plan_summary(self.biom_fp, 'qiime2', True,
+                           est['in-memory'] - 1)
+        self.assertEqual(obs, Plan('chunked', 'native', True, est['qza']))
+        # nor to save the qza
+        obs = plan_summary(self.biom_fp, 'qiime2', True, est['qza'] - 1)
+        self.assertEqual(obs, Plan('summary-only', 'native', False,
+                                   est['chunked']))
+        # unless the qza is not needed
+        obs = plan_summary(self.biom_fp, 'qiime2', False, est['chunked'])
+        self.assertEqual(obs.name, 'chunked')
+        self.assertFalse(obs.save_qza)
+
+    def test_describe_plan(self):
+        plan = Plan('chunked', 'native', True, 1.5 * 1024 ** 3)
+        self.assertEqual(
+            describe_plan(plan, 4 * 1024 ** 3),
+            'chunked summary (estimated peak memory 1.50 GB, budget '
+            '4.00 GB)')
+        self.assertEqual(
+            describe_plan(plan, 0),
+            'chunked summary (estimated peak memory 1.50 GB, budget '
+            'unlimited)')
+        self.assertEqual(
+            describe_plan(Plan('in-memory', 'qiime2', True, None)),
+            'in-memory summary (unlimited memory budget)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from unittest import main, TestCase
+
+import numpy as np
+
+from qtp_biom.remap import (
+    duplicated_samples_error, map_sample_ids, DUPLICATED_SAMPLES_ERROR,
+    MISSING_SAMPLES_ERROR, UNKNOWN_SAMPLES_ERROR)
+
+
+class MapSampleIdsTests(TestCase):
+    def test_map_sample_ids_valid(self):
+        metadata = {'1.S1': {}, '1.S2': {}, '1.S3': {}}
+        obs = map_sample_ids(['1.S2', '1.S1'], metadata)
+        self.assertEqual(obs, (None, ''))
+
+    def test_map_sample_ids_run_prefix(self):
+        metadata = {'1.S1': {'run_prefix': 'r1'},
+                    '1.S2': {'run_prefix': 'r2'},
+                    '1.S3': {'run_prefix': 'r3'}}
+        new_ids, error = map_sample_ids(['r3', 'r1'], metadata)
+        self.assertEqual(error, '')
+        self.assertEqual(new_ids.tolist(), ['1.S3', '1.S1'])
+
+    def test_map_sample_ids_run_prefix_duplicated(self):
+        # as in a dict from the run prefixes, the last sample wins
+        metadata = {'1.S1': {'run_prefix': 'r1'},
+                    '1.S2': {'run_prefix': 'r2'},
+                    '1.S3': {'run_prefix': 'r1'},
+                    '1.S4': {'run_prefix': 'r0'}}
+        new_ids, error = map_sample_ids(['r1', 'r2', 'r0'], metadata)
+        self.assertEqual(error, '')
+        self.assertEqual(new_ids.tolist(), ['1.S3', '1.S2', '1.S4'])
+
+    def test_map_sample_ids_run_prefix_missing(self):
+        metadata = {'1.S1': {'run_prefix': 'r1'},
+                    '1.S2': {'run_prefix': 'r2'}}
+        new_ids, error = map_sample_ids(['r1', 'New.Sample'], metadata)
+        self.assertIsNone(new_ids)
+        self.assertEqual(error, MISSING_SAMPLES_ERROR % 'New.Sample')
+
+    def test_map_sample_ids_prefix(self):
+        metadata = {'1.S1': {}, '1.S2': {}, '1.S3': {}}
+        new_ids, error = map_sample_ids(['S2', 'S3'], metadata)
+        self.assertEqual(error, '')
+        self.assertEqual(new_ids.tolist(), ['1.S2', '1.S3'])
+
+    def test_map_sample_ids_unknown(self):
+        metadata = {'1.S1': {}, '1.S2': {}}
+        obs = map_sample_ids(['S1', 'S4'], metadata)
+        self.assertEqual(obs, (None, UNKNOWN_SAMPLES_ERROR))
+        obs = map_sample_ids(['S1'], {})
+        self.assertEqual(obs, (None, UNKNOWN_SAMPLES_ERROR))
+
+
+class DuplicatedSamplesErrorTests(TestCase):
+    def test_duplicated_samples_error(self):
+        biom_ids = np.array(['r1', 'r2', 'r3', 'r4', 'r5'])
+        new_ids = np.array(['1.S2', '1.S1', '1.S2', '1.S3', '1.S1'])
+        self.assertEqual(
+            duplicated_samples_error(biom_ids, new_ids),
+            DUPLICATED_SAMPLES_ERROR % '1.S1 (r2, r5), 1.S2 (r1, r3)')
+
+    def test_duplicated_samples_error_unique(self):
+        biom_ids = np.array(['r1', 'r2'])
+        new_ids = np.array(['1.S2', '1.S1'])
+        self.assertEqual(duplicated_samples_error(biom_ids, new_ids), '')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from unittest import main, TestCase
+from tempfile import mkdtemp
+from os import listdir, stat, utime
+from os.path import exists, join
+from shutil import rmtree
+
+import numpy as np
+from biom import Table
+from biom.util import biom_open
+
+from qtp_biom import sidecar
+from qtp_biom.cache import file_hash
+from qtp_biom.sidecar import (
+    read_sidecar, write_sidecar, save_stats, load_stats, SIDECAR_SUFFIX)
+from qtp_biom.table import TableContext
+from qtp_biom.tests import plugin_config, set_plugin_config
+
+
+class SidecarTests(TestCase):
+    def setUp(self):
+        self.out_dir = mkdtemp()
+        self.biom_fp = join(self.out_dir, 'table.biom')
+        table = Table(np.arange(6).reshape(2, 3), ['O1', 'O2'],
+                      ['S1', 'S2', 'S3'])
+        with biom_open(self.biom_fp, 'w') as f:
+            table.to_hdf5(f, "Test")
+        set_plugin_config(self, '[biom]\nSTATS_SIDECAR = True\n')
+
+    def tearDown(self):
+        rmtree(self.out_dir)
+
+    def test_write_read_sidecar(self):
+        self.assertIsNone(read_sidecar(self.biom_fp))
+        stats = TableContext(self.biom_fp).stats()
+        stats['sample_ids'] = stats['sample_ids'].astype(object)
+        write_sidecar(self.biom_fp, stats, 'hash')
+
+        obs_stats, obs_hash = read_sidecar(self.biom_fp)
+        self.assertEqual(obs_hash, 'hash')
+        self.assertEqual(obs_stats['sample_ids'].tolist(), ['S1', 'S2', 'S3'])
+        np.testing.assert_array_equal(obs_stats['sample_totals'], [3, 5, 7])
+        np.testing.assert_array_equal(obs_stats['feature_nnz'], [2, 3])
+
+    def test_save_load_stats(self):
+        fp = join(self.out_dir, 'stats.npz')
+        exp = TableContext(self.biom_fp).stats()
+        save_stats(fp, exp, 'hash')
+        obs, obs_hash = load_stats(fp)
+        self.assertEqual(obs_hash, 'hash')
+        self.assertEqual(sorted(obs), sorted(exp))
+        for key in exp:
+            np.testing.assert_array_equal(obs[key], exp[key])
+        # the statistics saved without a signature don't match one
+        self.assertIsNone(load_stats(fp, (1, 2)))
+
+    def test_read_sidecar_stale(self):
+        stats = TableContext(self.biom_fp).stats()
+        write_sidecar(self.biom_fp, stats, 'hash')
+        # the table changed after the sidecar was written
+        st = stat(self.biom_fp)
+        utime(self.biom_fp, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+        self.assertIsNone(read_sidecar(self.biom_fp))
+
+    def test_read_sidecar_version(self):
+        stats = TableContext(self.biom_fp).stats()
+        old = sidecar.SIDECAR_VERSION
+        sidecar.SIDECAR_VERSION = old - 1
+        try:
+            write_sidecar(self.biom_fp, stats, 'hash')
+        finally:
+            sidecar.SIDECAR_VERSION = old
+        self.assertIsNone(read_sidecar(self.biom_fp))
+
+    def test_read_sidecar_corrupted(self):
+        with open(self.biom_fp + SIDECAR_SUFFIX, 'w') as f:
+            f.write('not a sidecar')
+        self.assertIsNone(read_sidecar(self.biom_fp))
+
+    def test_table_context_stats(self):
+        ctx = TableContext(self.biom_fp)
+        exp = ctx.stats()
+        self.assertTrue(exists(self.biom_fp + SIDECAR_SUFFIX))
+        self.assertEqual(ctx.content_hash(), file_hash(self.biom_fp))
+
+        # a new job reads the statistics and the hash from the sidecar
+        ctx = TableContext(self.biom_fp)
+        obs = ctx.stats()
+        self.assertEqual(ctx._hash, file_hash(self.biom_fp))
+        for key in exp:
+            np.testing.assert_array_equal(obs[key], exp[key])
+
+    def test_table_context_stats_without_sidecar(self):
+        # e.g. the uploaded tables being validated
+        ctx = TableContext(self.biom_fp, sidecar=False)
+        ctx.stats()
+        self.assertEqual(ctx.content_hash(), file_hash(self.biom_fp))
+        self.assertFalse(exists(self.biom_fp + SIDECAR_SUFFIX))
+        self.assertEqual(listdir(self.out_dir), ['table.biom'])
+
+    def test_table_context_stats_disabled(self):
+        with plugin_config():
+            TableContext(self.biom_fp).stats()
+        self.assertFalse(exists(self.biom_fp + SIDECAR_SUFFIX))
+
+
+if __name__ == '__main__':
+    main()
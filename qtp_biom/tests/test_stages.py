@@ -0,0 +1,96 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from unittest import main, TestCase
+from os import _exit, getpid, environ
+from unittest.mock import patch
+from time import sleep, perf_counter
+
+from qtp_biom.stages import run_stages, STAGE_DIED_ERROR
+from qtp_biom.instrument import Profiler
+
+
+def _ok(value):
+    return '', value
+
+
+def _pid():
+    return '', getpid()
+
+
+def _slow(seconds):
+    sleep(seconds)
+    return '', seconds
+
+
+def _fail(msg):
+    return msg, None
+
+
+def _raise():
+    raise ValueError('boom')
+
+
+def _die():
+    # as if the process was killed by the OOM killer
+    _exit(137)
+
+
+class RunStagesTests(TestCase):
+    def test_run_stages(self):
+        obs_error, obs_results = run_stages(
+            [(_ok, (1, ), False), (_ok, ('a', ), False), (_pid, (), True)])
+        self.assertEqual(obs_error, '')
+        self.assertEqual(obs_results[:2], [1, 'a'])
+        # the CPU-bound stage runs in a different process
+        self.assertNotEqual(obs_results[2], getpid())
+
+    def test_run_stages_concurrently(self):
+        start = perf_counter()
+        run_stages([(_slow, (0.5, ), False), (_slow, (0.5, ), False),
+                    (_slow, (0.5, ), True)])
+        self.assertLess(perf_counter() - start, 1.4)
+
+    def test_run_stages_profiler(self):
+        with patch.dict(environ, {'QTP_BIOM_PROFILE': '1'}):
+            profiler = Profiler()
+        obs_error, obs_results = run_stages(
+            [(_ok, (1, ), False), (_slow, (0.2, ), True)], profiler)
+        self.assertEqual(obs_error, '')
+        self.assertEqual(obs_results, [1, 0.2])
+        records = {r['stage']: r for r in profiler.records}
+        self.assertCountEqual(records, ['ok', 'slow'])
+        self.assertGreaterEqual(records['slow']['wall_time'], 0.2)
+
+    def test_run_stages_fail_fast(self):
+        start = perf_counter()
+        obs_error, _ = run_stages(
+            [(_slow, (5, ), True), (_fail, ('error 1', ), False)])
+        self.assertLess(perf_counter() - start, 4)
+        self.assertEqual(obs_error, 'error 1')
+
+    def test_run_stages_errors_aggregated(self):
+        obs_error, _ = run_stages(
+            [(_fail, ('error 1', ), True), (_fail, ('error 2', ), True)])
+        # the errors of the stages that finished before returning are
+        # reported in the order of the stages
+        self.assertIn(obs_error, ('error 1', 'error 2', 'error 1\nerror 2'))
+
+    def test_run_stages_process_died(self):
+        obs_error, obs_results = run_stages(
+            [(_slow, (0.2, ), False), (_die, (), True)])
+        self.assertEqual(obs_error, STAGE_DIED_ERROR % 'die')
+        self.assertEqual(obs_results[1], None)
+
+    def test_run_stages_exception(self):
+        with self.assertRaises(ValueError):
+            run_stages([(_ok, (1, ), False), (_raise, (), False)])
+
+
+if __name__ == '__main__':
+    main()
@@ -6,17 +6,24 @@
 # The full license is in the file LICENSE, distributed with this software.
 # -----------------------------------------------------------------------------
 
-from unittest import main
+from unittest import main, TestCase
 from tempfile import mkdtemp
-from os import remove
+from os import mkdir, remove
 from os.path import exists, isdir, join
 from shutil import rmtree
 from json import dumps
-from skbio.tree import TreeNode
+import sys
+from unittest.mock import patch
+
+import pandas as pd
 
 from qiita_client.testing import PluginTestCase
 
-from qtp_biom.summary import generate_html_summary, _generate_html_summary
+from qtp_biom.summary import (
+    generate_html_summary, _generate_html_summary, _metadata_to_qiime2)
+from qtp_biom.table import TableContext
+from qtp_biom.tests import set_plugin_config
+from qtp_biom.tree import tree_stats
 
 
 class SummaryTestsWith(PluginTestCase):
@@ -77,7 +84,7 @@ class SummaryTestsWith(PluginTestCase):
         md = self.qclient.get(qurl)
 
         # load phylogeny
-        tree = TreeNode.read(fp_tree)
+        tree = tree_stats(fp_tree)
 
         obs_index_fp, obs_viz_fp, qza_fp = _generate_html_summary(
             fp_biom, md, self.out_dir, True, tree=tree)
@@ -96,6 +103,128 @@ class SummaryTestsWith(PluginTestCase):
             obs_html = ''.join(f.readlines())
             self.assertTrue('<th>Number placed fragments</th>' not in obs_html)
 
+    def test__generate_html_summary_native(self):
+        fp_biom = join('qtp_biom', 'support_files', 'sepp.biom')
+        qurl = '/qiita_db/analysis/%s/metadata/' % 1
+        md = self.qclient.get(qurl)
+
+        obs_index_fp, obs_viz_fp, qza_fp = _generate_html_summary(
+            fp_biom, md, self.out_dir, True, backend='native')
+
+        with open(obs_index_fp) as f:
+            self.assertIn('./support_files/index.html', f.read())
+        with open(join(obs_viz_fp, 'index.html')) as f:
+            self.assertIn('<h2>Frequency per sample</h2>', f.read())
+        self.assertTrue(exists(qza_fp))
+
+    def test__generate_html_summary_native_metadata_change(self):
+        fp_biom = join('qtp_biom', 'support_files', 'sepp.biom')
+        qurl = '/qiita_db/analysis/%s/metadata/' % 1
+        md = self.qclient.get(qurl)
+
+        set_plugin_config(
+            self, '[cache]\nCACHE_DIR = %s\n' % join(self.out_dir, 'cache'))
+
+        out_dir = join(self.out_dir, 'first')
+        mkdir(out_dir)
+        _generate_html_summary(fp_biom, md, out_dir, True, backend='native')
+
+        # only the metadata changed, so the table statistics come from the
+        # cache and only the metadata is joined again. As in
+        # generate_html_summary, the qza is not saved again
+        md = {k: dict(v, new_column='new') for k, v in md.items()}
+        out_dir = join(self.out_dir, 'second')
+        mkdir(out_dir)
+        with patch.object(TableContext, 'stats',
+                          side_effect=AssertionError('table read')):
+            obs_index_fp, obs_viz_fp, qza_fp = _generate_html_summary(
+                fp_biom, md, out_dir, True, backend='native', save_qza=False)
+        self.assertIsNone(qza_fp)
+        with open(join(obs_viz_fp, 'sample-frequency-detail.csv')) as f:
+            self.assertIn('new_column', f.readline())
+
+    def test__generate_html_summary_no_qza(self):
+        fp_biom = join('qtp_biom', 'support_files', 'sepp.biom')
+        qurl = '/qiita_db/analysis/%s/metadata/' % 1
+        md = self.qclient.get(qurl)
+
+        for backend in ('native', 'qiime2'):
+            out_dir = mkdtemp()
+            self._clean_up_files.append(out_dir)
+            obs_index_fp, obs_viz_fp, qza_fp = _generate_html_summary(
+                fp_biom, md, out_dir, True, backend=backend, save_qza=False)
+            self.assertTrue(exists(obs_index_fp))
+            self.assertIsNone(qza_fp)
+            self.assertFalse(exists(join(out_dir, 'feature-table.qza')))
+
+
+class NativeSummaryTests(TestCase):
+    def setUp(self):
+        self.out_dir = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.out_dir)
+
+    def test__generate_html_summary_native_without_qiime2(self):
+        fp_biom = join('qtp_biom', 'support_files', 'sepp.biom')
+        ctx = TableContext(fp_biom)
+        md = pd.DataFrame({'column': 'value'}, index=ctx.sample_ids)
+
+        # the native backend doesn't need QIIME 2 if the qza is not saved
+        blocked = {name: None for name in list(sys.modules)
+                   if name.split('.')[0] == 'qiime2'}
+        blocked['qiime2'] = None
+        with patch.dict(sys.modules, blocked):
+            obs_index_fp, obs_viz_fp, qza_fp = _generate_html_summary(
+                ctx, md, self.out_dir, False, backend='native',
+                save_qza=False)
+        self.assertIsNone(qza_fp)
+        with open(join(obs_viz_fp, 'index.html')) as f:
+            self.assertIn('<h2>Frequency per sample</h2>', f.read())
+
+    def test__generate_html_summary_stats_cached_by_validate(self):
+        set_plugin_config(
+            self, '[cache]\nCACHE_DIR = %s\n' % join(self.out_dir, 'cache'))
+        fp_biom = join('qtp_biom', 'support_files', 'sepp.biom')
+        md = pd.DataFrame({'column': 'value'},
+                          index=TableContext(fp_biom).sample_ids)
+
+        # validate saves the qza, while the summary jobs don't
+        out_dir = join(self.out_dir, 'validate')
+        mkdir(out_dir)
+        _generate_html_summary(fp_biom, md, out_dir, False, backend='native')
+
+        out_dir = join(self.out_dir, 'summary')
+        mkdir(out_dir)
+        md['column'] = 'other'
+        with patch.object(TableContext, 'stats',
+                          side_effect=AssertionError('table read')):
+            obs_index_fp, obs_viz_fp, qza_fp = _generate_html_summary(
+                fp_biom, md, out_dir, False, backend='native', save_qza=False)
+        self.assertIsNone(qza_fp)
+        self.assertTrue(exists(obs_index_fp))
+
+
+class MetadataTests(TestCase):
+    def test_metadata_to_qiime2(self):
+        df = pd.DataFrame.from_dict(
+            {'1.S1': {'num': '1', 'cat': ' x ', 'empty': None, 'mixed': 3,
+                      'blank': ''},
+             '1.S2': {'num': '2.5', 'cat': '', 'empty': '', 'mixed': 'nan',
+                      'blank': ' '}},
+            orient='index')
+        obs = _metadata_to_qiime2(df)
+        self.assertEqual(obs.ids, ('1.S1', '1.S2'))
+        self.assertEqual(obs.columns['num'].type, 'numeric')
+        self.assertEqual(obs.columns['cat'].type, 'categorical')
+        self.assertEqual(obs.columns['empty'].type, 'numeric')
+        self.assertEqual(obs.columns['mixed'].type, 'categorical')
+        self.assertEqual(obs.columns['blank'].type, 'numeric')
+        obs_df = obs.to_dataframe()
+        self.assertEqual(obs_df.loc['1.S1', 'cat'], 'x')
+        self.assertTrue(pd.isnull(obs_df.loc['1.S2', 'cat']))
+        self.assertEqual(obs_df.loc['1.S2', 'num'], 2.5)
+
 
 if __name__ == '__main__':
     main()
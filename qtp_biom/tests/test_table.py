@@ -0,0 +1,100 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from unittest import main, TestCase
+from unittest.mock import patch
+from concurrent.futures import ThreadPoolExecutor
+from time import sleep
+from tempfile import mkstemp
+from os import close, remove
+from os.path import exists
+
+import numpy as np
+from biom import Table, load_table
+from biom.exception import TableException
+from biom.util import biom_open
+
+from qtp_biom.table import TableContext
+
+
+class TableContextTests(TestCase):
+    def setUp(self):
+        fd, self.biom_fp = mkstemp(suffix=".biom")
+        close(fd)
+        data = np.arange(6).reshape(2, 3)
+        table = Table(data, ['O1', 'O2'], ['S1', 'S2', 'S3'])
+        with biom_open(self.biom_fp, 'w') as f:
+            table.to_hdf5(f, "Test")
+
+    def tearDown(self):
+        for fp in (self.biom_fp, self.biom_fp + '.new'):
+            if exists(fp):
+                remove(fp)
+
+    def test_ids(self):
+        ctx = TableContext(self.biom_fp)
+        self.assertEqual(ctx.sample_ids.tolist(), ['S1', 'S2', 'S3'])
+        self.assertEqual(ctx.observation_ids.tolist(), ['O1', 'O2'])
+        # the ids of HDF5 tables are read without loading the matrix
+        self.assertIsNone(ctx._table)
+
+    def test_ids_json(self):
+        json_fp = self.biom_fp + '.new'
+        with open(json_fp, 'w') as f:
+            f.write(load_table(self.biom_fp).to_json("Test"))
+        ctx = TableContext(json_fp)
+        self.assertFalse(ctx.is_hdf5)
+        self.assertEqual(ctx.sample_ids.tolist(), ['S1', 'S2', 'S3'])
+        self.assertEqual(ctx.observation_ids.tolist(), ['O1', 'O2'])
+
+    def test_table_loaded_once(self):
+        ctx = TableContext(self.biom_fp)
+        self.assertIs(ctx.table, ctx.table)
+
+    def test_table_loaded_once_concurrently(self):
+        json_fp = self.biom_fp + '.new'
+        with open(json_fp, 'w') as f:
+            f.write(load_table(self.biom_fp).to_json("Test"))
+        ctx = TableContext(json_fp)
+
+        def slow_load(fp):
+            sleep(0.2)
+            return load_table(fp)
+
+        with patch('biom.load_table', side_effect=slow_load) as mock:
+            with ThreadPoolExecutor(2) as executor:
+                obs = list(executor.map(lambda _: ctx.table, range(2)))
+        self.assertEqual(mock.call_count, 1)
+        self.assertIs(obs[0], obs[1])
+
+    def test_update_sample_ids(self):
+        ctx = TableContext(self.biom_fp)
+        out_fp = self.biom_fp + '.new'
+        ctx.update_sample_ids(['1.S1', '1.S2', '1.S3'], out_fp)
+        self.assertEqual(ctx.fp, out_fp)
+        self.assertEqual(ctx.sample_ids.tolist(), ['1.S1', '1.S2', '1.S3'])
+        obs = load_table(out_fp)
+        self.assertEqual(obs.ids().tolist(), ['1.S1', '1.S2', '1.S3'])
+        np.testing.assert_array_equal(
+            obs.matrix_data.toarray(), np.arange(6).reshape(2, 3))
+        # the original file is not modified
+        self.assertEqual(load_table(self.biom_fp).ids().tolist(),
+                         ['S1', 'S2', 'S3'])
+
+    def test_update_sample_ids_errors(self):
+        ctx = TableContext(self.biom_fp)
+        out_fp = self.biom_fp + '.new'
+        with self.assertRaises(TableException):
+            ctx.update_sample_ids(['1.S1', '1.S2'], out_fp)
+        with self.assertRaises(TableException):
+            ctx.update_sample_ids(['X', 'X', 'Y'], out_fp)
+        self.assertFalse(exists(out_fp))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from unittest import main, TestCase
+from unittest.mock import patch
+from tempfile import mkstemp, mkdtemp
+from os import close, remove
+from os.path import join
+from shutil import rmtree
+
+from qtp_biom import tree
+from qtp_biom.tree import tree_stats, cached_tree_stats, TreeStats
+from qtp_biom.tests import plugin_config, set_plugin_config
+
+
+class TreeStatsTests(TestCase):
+    def setUp(self):
+        fd, self.tree_fp = mkstemp(suffix=".tre")
+        close(fd)
+
+    def tearDown(self):
+        remove(self.tree_fp)
+
+    def test_tree_stats(self):
+        with open(self.tree_fp, 'w') as f:
+            f.write("((ACGT:1,TTGA:1)n1:1,ref1:1,(ref2:1,ref3:1):1)root;\n")
+        self.assertEqual(tree_stats(self.tree_fp), TreeStats(2, 5))
+
+    def test_tree_stats_no_placements(self):
+        with open(self.tree_fp, 'w') as f:
+            f.write("((a,b),c);")
+        self.assertEqual(tree_stats(self.tree_fp), TreeStats(0, 3))
+
+    def test_tree_stats_unnamed_tips(self):
+        with open(self.tree_fp, 'w') as f:
+            f.write("((ACGT:1,:1):1,(:1,N1:1):1,c:1);")
+        self.assertEqual(tree_stats(self.tree_fp), TreeStats(1, 5))
+
+    def test_tree_stats_error(self):
+        with open(self.tree_fp, 'w') as f:
+            f.write(">O1 something\nACTG\n")
+        with self.assertRaises(ValueError):
+            tree_stats(self.tree_fp)
+
+
+class CachedTreeStatsTests(TestCase):
+    def setUp(self):
+        self.base_dir = mkdtemp()
+        self.tree_fp = join(self.base_dir, 'insertion_tree.tre')
+        with open(self.tree_fp, 'w') as f:
+            f.write("((ACGT:1,TTGA:1)n1:1,ref1:1,(ref2:1,ref3:1):1)root;\n")
+        set_plugin_config(
+            self, '[cache]\nCACHE_DIR = %s\n' % join(self.base_dir, 'cache'))
+
+    def tearDown(self):
+        rmtree(self.base_dir)
+
+    def test_cached_tree_stats(self):
+        self.assertEqual(cached_tree_stats(self.tree_fp),
+                         (TreeStats(2, 5), False))
+        # the same tree in another file is not parsed again
+        other_fp = join(self.base_dir, 'other.tre')
+        with open(self.tree_fp) as fin, open(other_fp, 'w') as fout:
+            fout.write(fin.read())
+        with patch.object(tree, '_parse', side_effect=AssertionError):
+            self.assertEqual(cached_tree_stats(other_fp),
+                             (TreeStats(2, 5), True))
+
+    def test_cached_tree_stats_disabled(self):
+        with plugin_config():
+            self.assertEqual(cached_tree_stats(self.tree_fp),
+                             (TreeStats(2, 5), False))
+            self.assertEqual(cached_tree_stats(self.tree_fp),
+                             (TreeStats(2, 5), False))
+
+
+if __name__ == '__main__':
+    main()
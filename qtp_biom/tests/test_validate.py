@@ -6,7 +6,7 @@
 # The full license is in the file LICENSE, distributed with this software.
 # -----------------------------------------------------------------------------
 
-from unittest import main
+from unittest import main, TestCase
 from tempfile import mkstemp, mkdtemp
 from os import close, remove, mkdir
 from os.path import exists, isdir, join, basename
@@ -20,7 +20,7 @@ from biom.util import biom_open
 from qiita_client import ArtifactInfo
 from qiita_client.testing import PluginTestCase
 
-from qtp_biom.validate import validate
+from qtp_biom.validate import validate, _check_representative_set
 
 
 class CreateTests(PluginTestCase):
@@ -346,5 +346,39 @@ class CreateTests(PluginTestCase):
             "found in the BIOM tabe: O2")
 
 
+class RepresentativeSetTests(TestCase):
+    def setUp(self):
+        fd, self.fasta_fp = mkstemp(suffix=".fna")
+        close(fd)
+
+    def tearDown(self):
+        remove(self.fasta_fp)
+
+    def test_check_representative_set(self):
+        with open(self.fasta_fp, 'w') as f:
+            f.write(">O2 something\nACTG\n>O1\nATGC\n")
+        obs = _check_representative_set(['O1', 'O2'], self.fasta_fp)
+        self.assertEqual(obs, '')
+
+    def test_check_representative_set_errors(self):
+        with open(self.fasta_fp, 'w') as f:
+            f.write(">O1\nACTG\n>O3\nATGC\n>O1 again\nATGC\n")
+        obs = _check_representative_set(['O1', 'O2'], self.fasta_fp)
+        exp = ("The representative set sequence file includes observations "
+               "not found in the BIOM table: O3\n"
+               "The representative set sequence file is missing observation "
+               "ids found in the BIOM tabe: O2\n"
+               "The representative set sequence file has duplicated "
+               "sequence ids: O1")
+        self.assertEqual(obs, exp)
+
+    def test_check_representative_set_truncated(self):
+        with open(self.fasta_fp, 'w') as f:
+            f.write(">O1\nACTG\n")
+        observation_ids = ['O%d' % i for i in range(1, 201)]
+        obs = _check_representative_set(observation_ids, self.fasta_fp)
+        self.assertTrue(obs.endswith('O101 (and 99 more)'))
+
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,74 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from unittest import main, TestCase
+from tempfile import mkdtemp
+from os import stat
+from os.path import exists, join
+from shutil import rmtree
+from multiprocessing import AuthenticationError, get_context
+from time import sleep
+
+from qtp_biom.worker import serve, submit, stop
+
+
+def _handler(url, job_id, output_dir):
+    with open(join(output_dir, job_id), 'w') as f:
+        f.write(url)
+
+
+class WorkerTests(TestCase):
+    def setUp(self):
+        self.out_dir = mkdtemp()
+        self.address = join(self.out_dir, 'worker.sock')
+        self.authkey = b'secret'
+        # the worker runs in a fresh process, as biom_worker does, so it
+        # doesn't share the fork server of the tests
+        self.server = get_context('spawn').Process(
+            target=serve, args=(self.address, _handler, self.authkey))
+        self.server.start()
+        for i in range(100):
+            if exists(self.address):
+                break
+            sleep(0.1)
+
+    def tearDown(self):
+        if self.server.is_alive():
+            self.server.terminate()
+        rmtree(self.out_dir)
+
+    def test_submit(self):
+        obs = submit(self.address, 'https://localhost:8383', 'job-1',
+                     self.out_dir, self.authkey)
+        self.assertEqual(obs, 0)
+        with open(join(self.out_dir, 'job-1')) as f:
+            self.assertEqual(f.read(), 'https://localhost:8383')
+
+        stop(self.address, self.authkey)
+        self.server.join(10)
+        self.assertFalse(self.server.is_alive())
+
+    def test_submit_unauthenticated(self):
+        # only the user running the worker can connect
+        self.assertEqual(stat(self.address).st_mode & 0o777, 0o600)
+        with self.assertRaises(AuthenticationError):
+            submit(self.address, 'url', 'job-1', self.out_dir, b'wrong')
+        self.assertFalse(exists(join(self.out_dir, 'job-1')))
+        # the worker keeps serving the authenticated clients
+        obs = submit(self.address, 'url', 'job-2', self.out_dir,
+                     self.authkey)
+        self.assertEqual(obs, 0)
+
+    def test_submit_no_worker(self):
+        with self.assertRaises(OSError):
+            submit(join(self.out_dir, 'missing.sock'), 'url', 'job-1',
+                   self.out_dir, self.authkey)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from collections import namedtuple
+from json import dump, load
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+
+import numpy as np
+
+from . import cache
+
+
+TreeStats = namedtuple('TreeStats', ['num_placements', 'num_tips'])
+
+TREE_STATS_FN = 'tree-stats.json'
+
+
+def _bp_stats(tree):
+    """Computes the tip statistics of a balanced parentheses tree
+
+    Parameters
+    ----------
+    tree : bp.BP
+        The parsed tree
+
+    Returns
+    -------
+    TreeStats
+        The number of placed fragments and the total number of tips
+    """
+    B = np.asarray(tree.B, dtype=bool)
+    # a tip is an open parenthesis immediately followed by a close one
+    tips = np.flatnonzero(B[:-1] & ~B[1:])
+    # placed fragments are the tips named after their sequence. Only the
+    # names of the tips are looked up, and unnamed tips (None) are skipped
+    num_placements = sum(1 for i in tips.tolist()
+                         if (tree.name(i) or '')[:1] in ('A', 'T', 'G', 'C'))
+    return TreeStats(num_placements, len(tips))
+
+
+def _parse(fp):
+    """Parses a Newick file into a balanced parentheses tree"""
+    import bp
+
+    with open(fp) as f:
+        return bp.parse_newick(f.read())
+
+
+def _cache_key(fp):
+    """The cache key of the statistics of a tree file"""
+    return cache.cache_key('tree', cache.file_hash(fp))
+
+
+def _store(key, stats):
+    """Stores the statistics of a tree in the cache"""
+    tmp_dir = mkdtemp()
+    try:
+        with open(join(tmp_dir, TREE_STATS_FN), 'w') as f:
+            dump(stats._asdict(), f)
+        cache.store(key, [TREE_STATS_FN], tmp_dir)
+    finally:
+        rmtree(tmp_dir, ignore_errors=True)
+
+
+def cached_tree_stats(fp):
+    """Computes the tip statistics of a Newick file, memoized across jobs
+
+    Many artifacts are placed in the same reference tree, so the statistics
+    are cached by the contents of the file, if the cache is enabled.
+
+    Parameters
+    ----------
+    fp : str
+        The Newick filepath
+
+    Returns
+    -------
+    TreeStats, bool
+        The number of placed fragments and the total number of tips
+        Whether the statistics were retrieved from the cache
+
+    Raises
+    ------
+    ValueError
+        If the file is not a valid Newick tree
+    """
+    if cache.cache_dir() is None:
+        return _bp_stats(_parse(fp)), False
+
+    key = _cache_key(fp)
+    entry = cache.lookup(key, [TREE_STATS_FN])
+    if entry is not None:
+        try:
+            with open(join(entry, TREE_STATS_FN)) as f:
+                return TreeStats(**load(f)), True
+        except (OSError, ValueError, TypeError):
+            # evicted or partially removed concurrently
+            pass
+
+    stats = _bp_stats(_parse(fp))
+    try:
+        _store(key, stats)
+    except OSError:
+        # the cache is only an optimization
+        pass
+    return stats, False
+
+
+def tree_stats(fp):
+    """Parses a Newick file and computes its tip statistics
+
+    Parameters
+    ----------
+    fp : str
+        The Newick filepath
+
+    Returns
+    -------
+    TreeStats
+        The number of placed fragments and the total number of tips
+
+    Raises
+    ------
+    ValueError
+        If the file is not a valid Newick tree
+    """
+    return cached_tree_stats(fp)[0]
@@ -0,0 +1,130 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from configparser import ConfigParser
+from contextlib import contextmanager
+from functools import lru_cache
+from os import environ, remove, rename, stat
+from os.path import abspath, dirname, exists, join
+from tempfile import mkstemp
+
+
+PLUGIN_VERSION = '2.1.4 - Qiime2'
+
+DEFAULT_CONFIG_FP = join(dirname(__file__), 'support_files',
+                         'config_file.cfg')
+
+# Maximum number of ids listed in a single error message, so huge tables
+# don't end up in the error message sent to Qiita
+MAX_REPORTED_IDS = 100
+
+
+def format_ids(ids):
+    """Formats a list of ids for an error message, truncating it if needed
+
+    Parameters
+    ----------
+    ids : list of str
+        The ids to format
+
+    Returns
+    -------
+    str
+        The comma-separated ids, with at most MAX_REPORTED_IDS of them
+    """
+    if len(ids) <= MAX_REPORTED_IDS:
+        return ', '.join(ids)
+    return '%s (and %d more)' % (', '.join(ids[:MAX_REPORTED_IDS]),
+                                 len(ids) - MAX_REPORTED_IDS)
+
+
+@lru_cache()
+def get_config():
+    """Reads the plugin configuration
+
+    The values in the file pointed by the QTP_BIOM_CONFIG_FP environment
+    variable, if set, override the ones in the default configuration file.
+
+    Returns
+    -------
+    configparser.ConfigParser
+        The plugin configuration
+    """
+    config = ConfigParser()
+    config.read(DEFAULT_CONFIG_FP)
+    if 'QTP_BIOM_CONFIG_FP' in environ:
+        config.read(environ['QTP_BIOM_CONFIG_FP'])
+    return config
+
+
+def plugin_credentials(plugin):
+    """Reads the Qiita credentials of the plugin, stored when registering it
+
+    Parameters
+    ----------
+    plugin : qiita_client.QiitaTypePlugin
+        The plugin
+
+    Returns
+    -------
+    configparser.ConfigParser
+        The plugin configuration, with the credentials in the oauth2 section
+    """
+    config = ConfigParser()
+    with open(plugin.conf_fp) as f:
+        config.read_file(f)
+    return config
+
+
+def file_signature(fp):
+    """The size and modification time identifying the contents of a file
+
+    Parameters
+    ----------
+    fp : str
+        The filepath
+
+    Returns
+    -------
+    int, int
+        The size, in bytes, and the modification time, in nanoseconds
+    """
+    st = stat(fp)
+    return st.st_size, st.st_mtime_ns
+
+
+@contextmanager
+def atomic_write(fp, mode='w', **kwargs):
+    """Opens a temporary file that replaces fp once it is fully written
+
+    The temporary file is created next to fp, so concurrent readers of fp
+    never see a partially written file.
+
+    Parameters
+    ----------
+    fp : str
+        The filepath
+    mode : str, optional
+        The mode to open the temporary file with
+    kwargs : dict, optional
+        Other arguments of open
+
+    Raises
+    ------
+    OSError
+        If the directory of fp is not writable
+    """
+    fd, tmp = mkstemp(dir=dirname(abspath(fp)), prefix='.tmp-')
+    try:
+        with open(fd, mode, **kwargs) as f:
+            yield f
+        rename(tmp, fp)
+    except BaseException:
+        if exists(tmp):
+            remove(tmp)
+        raise
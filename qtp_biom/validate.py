@@ -10,17 +10,188 @@ from os.path import join, basename
 
 from json import loads
 
-from biom import load_table
-from biom.util import biom_open
-from biom.exception import TableException
 from tarfile import is_tarfile
 from qiita_client import ArtifactInfo
-from qiita_files.parse import load, FastaIterator
 from .summary import _generate_html_summary, _generate_metadata_file
-import bp
+from .table import TableContext
+from .tree import cached_tree_stats
+from .stages import run_stages
+from .fasta import fasta_ids
+from .instrument import Profiler
+from .integrity import check_biom
+from .planner import describe_plan, plan_summary
+from .client import AsyncStepsClient, get_concurrently
+from .remap import map_sample_ids
+from .util import format_ids
 
 
-def validate(qclient, job_id, parameters, out_dir):
+def _check_representative_set(observation_ids, repset_fp):
+    """Checks that the representative set matches the BIOM observation ids
+
+    Parameters
+    ----------
+    observation_ids : iterable of str
+        The observation ids of the BIOM table
+    repset_fp : str
+        The representative set FASTA filepath
+
+    Returns
+    -------
+    str
+        The error message, empty if the ids match
+    """
+    observation_ids = list(observation_ids)
+    pending = set(observation_ids)
+    seen = set()
+    extra_ids = []
+    duplicated_ids = []
+    for rec_id in fasta_ids(repset_fp):
+        if rec_id in seen:
+            duplicated_ids.append(rec_id)
+            continue
+        seen.add(rec_id)
+        if rec_id in pending:
+            pending.remove(rec_id)
+        else:
+            extra_ids.append(rec_id)
+    missing_ids = [oid for oid in observation_ids if oid in pending]
+
+    error_msg = []
+    if extra_ids:
+        error_msg.append("The representative set sequence file includes "
+                         "observations not found in the BIOM table: %s"
+                         % format_ids(extra_ids))
+    if missing_ids:
+        error_msg.append("The representative set sequence file is missing "
+                         "observation ids found in the BIOM tabe: %s" %
+                         format_ids(missing_ids))
+    if duplicated_ids:
+        error_msg.append("The representative set sequence file has "
+                         "duplicated sequence ids: %s"
+                         % format_ids(duplicated_ids))
+
+    return '\n'.join(error_msg)
+
+
+def _validate_sample_ids(qclient, job_id, ctx, metadata, out_dir):
+    """Checks the BIOM sample ids against the metadata, fixing them if needed
+
+    Parameters
+    ----------
+    qclient : qiita_client.QiitaClient
+        The Qiita server client
+    job_id : str
+        The job id
+    ctx : qtp_biom.table.TableContext
+        The BIOM table
+    metadata : dict of {str: dict}
+        The metadata, keyed by sample id
+    out_dir : str
+        The path to the job's output directory
+
+    Returns
+    -------
+    str, str
+        The error message, empty if the ids are valid
+        The filepath of the BIOM table with the valid ids
+    """
+    biom_fp = ctx.fp
+    new_ids, error_msg = map_sample_ids(ctx.sample_ids, metadata)
+    if error_msg:
+        return error_msg, None
+    if new_ids is None:
+        return '', biom_fp
+
+    # The BIOM sample ids are different from the ones in the prep template
+    qclient.update_job_step(job_id, "Step 3: Fixing BIOM sample ids")
+    new_biom_fp = join(out_dir, basename(biom_fp))
+    # map_sample_ids already checked that the new ids are unique
+    ctx.update_sample_ids(new_ids, new_biom_fp)
+    return '', new_biom_fp
+
+
+def _validate_representative_set(ctx, repset_fp):
+    """Stage wrapper of _check_representative_set
+
+    Parameters
+    ----------
+    ctx : qtp_biom.table.TableContext
+        The BIOM table
+    repset_fp : str
+        The representative set FASTA filepath
+
+    Returns
+    -------
+    str, None
+        The error message, empty if the ids match
+        Ignored
+    """
+    # The observations ids of the biom table should be the same
+    # as the representative sequences ids found in the representative set
+    return _check_representative_set(ctx.observation_ids, repset_fp), None
+
+
+def _validate_tree(tree_fp):
+    """Checks that the phylogenetic tree can be parsed
+
+    Parameters
+    ----------
+    tree_fp : str
+        The Newick filepath
+
+    Returns
+    -------
+    str, (qtp_biom.tree.TreeStats, bool)
+        The error message, empty if the tree is valid
+        The statistics of the tree, if it is valid, and whether they were
+        retrieved from the cache
+    """
+    try:
+        return '', cached_tree_stats(tree_fp)
+    except Exception:
+        return "Phylogenetic tree cannot be parsed via scikit-biom", None
+
+
+def _collect_metadata(qclient, prep_id, analysis_id):
+    """Retrieves the metadata of a preparation or an analysis from Qiita
+
+    Parameters
+    ----------
+    qclient : qiita_client.QiitaClient
+        The Qiita server client
+    prep_id : int or None
+        The preparation id
+    analysis_id : int or None
+        The analysis id, used if prep_id is None
+
+    Returns
+    -------
+    bool, dict, pd.DataFrame or dict
+        Whether the metadata belongs to an analysis
+        The metadata, keyed by sample id
+        The metadata to summarize the table
+
+    Raises
+    ------
+    ValueError
+        If both prep_id and analysis_id are None
+    """
+    if prep_id is not None:
+        # the prep information data and files are independent requests
+        metadata, response = get_concurrently(
+            qclient, ["/qiita_db/prep_template/%s/data/" % prep_id,
+                      "/qiita_db/prep_template/%s/" % prep_id])
+        metadata = metadata['data']
+
+        return False, metadata, _generate_metadata_file(response)
+    elif analysis_id is not None:
+        metadata = qclient.get("/qiita_db/analysis/%s/metadata/" % analysis_id)
+
+        return True, metadata, metadata
+    raise ValueError("Missing metadata information")
+
+
+def validate(qclient, job_id, parameters, out_dir, metadata=None):
     """Validate and fix a new BIOM artifact
 
     Parameters
@@ -33,6 +204,9 @@ def validate(qclient, job_id, parameters, out_dir):
         The parameter values to validate and create the artifact
     out_dir : str
         The path to the job's output directory
+    metadata : tuple, optional
+        The metadata of the artifact, as returned by _collect_metadata. If
+        not provided, it is retrieved from Qiita
 
     Returns
     -------
@@ -41,6 +215,17 @@ def validate(qclient, job_id, parameters, out_dir):
         The artifact information, if successful
         The error message, if not successful
     """
+    with AsyncStepsClient(qclient) as client:
+        profiler = Profiler(client, job_id)
+        try:
+            return _validate(client, job_id, parameters, out_dir, metadata,
+                             profiler)
+        finally:
+            profiler.write(out_dir)
+
+
+def _validate(qclient, job_id, parameters, out_dir, metadata, profiler):
+    """Validate and fix a new BIOM artifact, see validate"""
     prep_id = parameters.get('template')
     analysis_id = parameters.get('analysis')
     files = loads(parameters['files'])
@@ -50,129 +235,76 @@ def validate(qclient, job_id, parameters, out_dir):
         return (False, None, "Unknown artifact type %s. Supported types: BIOM"
                              % a_type)
 
-    qclient.update_job_step(job_id, "Step 1: Collecting metadata")
-    if prep_id is not None:
-        is_analysis = False
-        metadata = qclient.get("/qiita_db/prep_template/%s/data/" % prep_id)
-        metadata = metadata['data']
-
-        qurl = ('/qiita_db/prep_template/%s/' % prep_id)
-        response = qclient.get(qurl)
+    # Corrupt files are reported before any expensive step of the job
+    with profiler.stage('check_integrity'):
+        error_msg = check_biom(files['biom'][0])
+    if error_msg:
+        return False, None, error_msg
 
-        md = f'{out_dir}/merged_information_file.txt'
-        _generate_metadata_file(response, md)
-    elif analysis_id is not None:
-        is_analysis = True
-        metadata = qclient.get("/qiita_db/analysis/%s/metadata/" % analysis_id)
-
-        md = metadata
-    else:
-        return (False, None, "Missing metadata information")
+    qclient.update_job_step(job_id, "Step 1: Collecting metadata")
+    if metadata is None:
+        if prep_id is None and analysis_id is None:
+            return (False, None, "Missing metadata information")
+        with profiler.stage('collect_metadata'):
+            metadata = _collect_metadata(qclient, prep_id, analysis_id)
+    is_analysis, metadata, md = metadata
 
-    # Check if the biom table has the same sample ids as the prep info
+    # Check if the biom table has the same sample ids as the prep info, and
+    # validate the representative set and the sequence specific phylogenetic
+    # tree (e.g. generated by SEPP for Deblur), if they exist. These checks
+    # are independent so they run concurrently
     qclient.update_job_step(job_id, "Step 2: Validating BIOM file")
-    new_biom_fp = biom_fp = files['biom'][0]
-    table = load_table(biom_fp)
-    metadata_ids = set(metadata)
-    biom_sample_ids = set(table.ids())
-
-    if not metadata_ids.issuperset(biom_sample_ids):
-        # The BIOM sample ids are different from the ones in the prep template
-        qclient.update_job_step(job_id, "Step 3: Fixing BIOM sample ids")
-        # Attempt 1: the user provided the run prefix column - in this case
-        # the run prefix column holds the sample ids present in the BIOM file
-        if 'run_prefix' in metadata[next(iter(metadata_ids))]:
-            id_map = {v['run_prefix']: k for k, v in metadata.items()}
-        else:
-            # Attemp 2: the sample ids in the BIOM table are the same that in
-            # the prep template but without the prefix
-            prefix = next(iter(metadata_ids)).split('.', 1)[0]
-            prefixed = set("%s.%s" % (prefix, s) for s in biom_sample_ids)
-            if metadata_ids.issuperset(prefixed):
-                id_map = {s: "%s.%s" % (prefix, s) for s in biom_sample_ids}
-            else:
-                # There is nothing we can do. The samples in the BIOM table do
-                # not match the ones in the prep template and we can't fix it
-                error_msg = ('The sample ids in the BIOM table do not match '
-                             'the ones in the prep information. Please, '
-                             'provide the column "run_prefix" in the prep '
-                             'information to map the existing sample ids to '
-                             'the prep information sample ids.')
-                return False, None, error_msg
-
-        # Fix the sample ids
-        try:
-            table.update_ids(id_map, axis='sample')
-        except TableException:
-            missing = biom_sample_ids - set(id_map)
-            error_msg = ('Your prep information is missing samples that are '
-                         'present in your BIOM table: %s' % ', '.join(missing))
-            return False, None, error_msg
-
-        new_biom_fp = join(out_dir, basename(biom_fp))
-        with biom_open(new_biom_fp, 'w') as f:
-            table.to_hdf5(f, "Qiita BIOM type plugin")
+    # the table is loaded once and shared by all the stages of the job. The
+    # table is in the upload directory or in the job directory, where a
+    # sidecar would not be moved with the artifact, so the sidecar is only
+    # written by the summary jobs, next to the table in the artifact storage
+    ctx = TableContext(files['biom'][0], sidecar=False)
+    stages = [(_validate_sample_ids,
+               (qclient, job_id, ctx, metadata, out_dir), False)]
+    if 'preprocessed_fasta' in files:
+        stages.append((_validate_representative_set,
+                       (ctx, files['preprocessed_fasta'][0]), False))
+    # if the tree is a tgz, we just pass the file
+    tree_fp = None
+    if 'plain_text' in files and not is_tarfile(files['plain_text'][0]):
+        tree_fp = files['plain_text'][0]
+        stages.append((_validate_tree, (tree_fp, ), True))
 
-    filepaths = [(new_biom_fp, 'biom')]
+    error_msg, results = run_stages(stages, profiler)
+    if error_msg:
+        return False, None, error_msg
 
-    # Validate the representative set, if it exists
+    filepaths = [(results[0], 'biom')]
     if 'preprocessed_fasta' in files:
-        repset_fp = files['preprocessed_fasta'][0]
-
-        # The observations ids of the biom table should be the same
-        # as the representative sequences ids found in the representative set
-        observation_ids = table.ids(axis='observation').tolist()
-        extra_ids = []
-        for record in load([repset_fp], constructor=FastaIterator):
-            rec_id = record['SequenceID'].split()[0]
-            try:
-                observation_ids.remove(rec_id)
-            except ValueError:
-                extra_ids.append(rec_id)
-
-        error_msg = []
-        if extra_ids:
-            error_msg.append("The representative set sequence file includes "
-                             "observations not found in the BIOM table: %s"
-                             % ', '.join(extra_ids))
-        if observation_ids:
-            error_msg.append("The representative set sequence file is missing "
-                             "observation ids found in the BIOM tabe: %s" %
-                             ', '.join(observation_ids))
-
-        if error_msg:
-            return False, None, '\n'.join(error_msg)
-
-        filepaths.append((repset_fp, 'preprocessed_fasta'))
-
-    # Validate the sequence specific phylogenetic tree (e.g. generated
-    # by SEPP for Deblur), if it exists
+        filepaths.append((files['preprocessed_fasta'][0],
+                          'preprocessed_fasta'))
     tree = None
+    if tree_fp is not None:
+        tree, tree_hit = results[-1]
+        if tree_hit:
+            qclient.update_job_step(
+                job_id, "Step 2: Phylogenetic tree statistics retrieved from "
+                "the cache")
     if 'plain_text' in files:
-        # first let's check if is a tgz, if it is, just pass the file
-        filename = files['plain_text'][0]
-        if is_tarfile(filename):
-            filepaths.append((filename, 'plain_text'))
-        else:
-            try:
-                tree = bp.parse_newick(open(filename).read())
-                tree = bp.to_skbio_treenode(tree)
-                filepaths.append((filename, 'plain_text'))
-            except Exception:
-                return False, None, ("Phylogenetic tree cannot be parsed "
-                                     "via scikit-biom")
+        filepaths.append((files['plain_text'][0], 'plain_text'))
 
     for fp_type, fps in files.items():
         if fp_type not in ('biom', 'preprocessed_fasta', 'plain_text'):
             for fp in fps:
                 filepaths.append((fp, fp_type))
 
+    # the summary path depends on the size of the table and the memory
+    # available to the job
+    plan = plan_summary(ctx.fp, save_qza='qza' not in files)
+    qclient.update_job_step(
+        job_id, "Step 4: Generating the %s" % describe_plan(plan))
     index_fp, viz_fp, qza_fp = _generate_html_summary(
-        new_biom_fp, md, join(out_dir), is_analysis, tree)
+        ctx, md, join(out_dir), is_analysis, tree, backend=plan.backend,
+        profiler=profiler, save_qza=plan.save_qza)
 
     filepaths.append((index_fp, 'html_summary'))
     filepaths.append((viz_fp, 'html_summary_dir'))
-    if 'qza' not in files:
+    if qza_fp is not None:
         filepaths.append((qza_fp, 'qza'))
 
     return True, [ArtifactInfo(None, 'BIOM', filepaths)], ""
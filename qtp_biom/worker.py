@@ -0,0 +1,161 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2014--, The Qiita Development Team.
+#
+# Distributed under the terms of the BSD 3-clause License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# -----------------------------------------------------------------------------
+
+from multiprocessing import AuthenticationError, get_context
+from multiprocessing.connection import Listener, Client
+from os import umask
+from threading import Thread
+
+from .util import get_config, plugin_credentials
+
+
+STOP = 'stop'
+
+# The modules imported by the fork server, so the jobs forked from it don't
+# import QIIME 2 and its plugins again
+PRELOAD = ['qtp_biom.validate', 'qtp_biom.summary',
+           'qiime2.plugins.feature_table.visualizers']
+
+
+def worker_authkey():
+    """The key authenticating the clients of the worker
+
+    Returns
+    -------
+    bytes
+        The AUTHKEY in the worker section of the configuration or, if not
+        set, the client secret of the plugin, so only the users that can
+        read the plugin credentials can submit jobs
+    """
+    key = get_config().get('worker', 'AUTHKEY', fallback='').strip()
+    if not key:
+        from . import plugin
+        key = plugin_credentials(plugin).get('oauth2', 'CLIENT_SECRET')
+    return key.encode('utf-8')
+
+
+def _run_job(url, job_id, output_dir):
+    """Executes a job with the plugin"""
+    from . import plugin
+
+    plugin(url, job_id, output_dir)
+
+
+def _wait_job(process, conn):
+    """Waits for a job process and sends its exit code to the client"""
+    process.join()
+    try:
+        conn.send(process.exitcode)
+    finally:
+        conn.close()
+
+
+def serve(address, handler=None, authkey=None):
+    """Runs the jobs submitted to address until it receives a stop request
+
+    Each job runs in a process forked from a fork server that has already
+    imported QIIME 2 and its plugins, so they are only initialized once.
+    The server itself waits for the jobs in threads, so it never forks.
+
+    Parameters
+    ----------
+    address : str
+        The path of the unix socket to listen to. Only the user running the
+        worker can connect to it
+    handler : callable, optional
+        The function executing a job, called as handler(url, job_id,
+        output_dir). It must be importable by the job processes. Defaults to
+        the plugin itself
+    authkey : bytes, optional
+        The key the clients must authenticate with, defaults to
+        worker_authkey()
+    """
+    ctx = get_context('forkserver')
+    if handler is None:
+        handler = _run_job
+        ctx.set_forkserver_preload(PRELOAD)
+    if authkey is None:
+        authkey = worker_authkey()
+
+    # the socket is created with mode 0600
+    mask = umask(0o177)
+    try:
+        listener = Listener(address, family='AF_UNIX', authkey=authkey)
+    finally:
+        umask(mask)
+
+    with listener:
+        while True:
+            try:
+                conn = listener.accept()
+            except AuthenticationError:
+                # the messages of unauthenticated clients are never read
+                continue
+            msg = conn.recv()
+            if msg == STOP:
+                conn.send(0)
+                conn.close()
+                break
+            url, job_id, output_dir = msg
+            process = ctx.Process(target=handler,
+                                  args=(url, job_id, output_dir))
+            process.start()
+            Thread(target=_wait_job, args=(process, conn),
+                   daemon=True).start()
+
+
+def submit(address, url, job_id, output_dir, authkey=None):
+    """Submits a job to a running worker and waits for it to finish
+
+    Parameters
+    ----------
+    address : str
+        The path of the worker unix socket
+    url : str
+        The url of the Qiita server
+    job_id : str
+        The job id
+    output_dir : str
+        The path to the job's output directory
+    authkey : bytes, optional
+        The key of the worker, defaults to worker_authkey()
+
+    Returns
+    -------
+    int
+        The exit code of the job process
+
+    Raises
+    ------
+    OSError
+        If there is no worker listening in address
+    multiprocessing.AuthenticationError
+        If the worker doesn't accept authkey
+    """
+    if authkey is None:
+        authkey = worker_authkey()
+    with Client(address, family='AF_UNIX', authkey=authkey) as conn:
+        conn.send((url, job_id, output_dir))
+        return conn.recv()
+
+
+def stop(address, authkey=None):
+    """Stops the worker listening in address
+
+    Parameters
+    ----------
+    address : str
+        The path of the worker unix socket
+    authkey : bytes, optional
+        The key of the worker, defaults to worker_authkey()
+    """
+    if authkey is None:
+        authkey = worker_authkey()
+    with Client(address, family='AF_UNIX', authkey=authkey) as conn:
+        conn.send(STOP)
+        conn.recv()
@@ -43,7 +43,7 @@ setup(name='qtp-biom',
       package_data={'qtp_biom': ['support_files/config_file.cfg']},
       scripts=glob('scripts/*'),
       extras_require={'test': ["nose >= 0.10.1", "pep8"]},
-      install_requires=['click', 'biom-format', 'qiime2', 'numpy',
+      install_requires=['click', 'biom-format', 'qiime2', 'numpy', 'h5py',
                         'qiita-files @ https://github.com/qiita-spots/'
                         'qiita-files/archive/master.zip',
                         'qiita_client @ https://github.com/qiita-spots/'